@@ -5,7 +5,18 @@ import copy
 import time
 import random
 import math
-from ai_algorithms import AStarFuzzyAI
+import os
+import json
+from collections import OrderedDict, deque
+try:
+    import numpy as np
+except ImportError:  # optional: the background falls back to per-row lines
+    np = None
+from ai_algorithms import AStarFuzzyAI, MinimaxAI
+from engine import NUM_NODES, Layout, captures
+from engine.book import OpeningBook
+from engine.tablebase import Tablebase
+from engine.worker import SearchWorker
 pygame.init()
 
 screen_info = pygame.display.Info()
@@ -33,8 +44,305 @@ RED = COLOR_AI
 GREEN = COLOR_HUMAN
 OPTION_COLOR = COLOR_OPTION
 
+# The animated background gradient is regenerated at most this often (ms)
+BACKGROUND_REFRESH_MS = 100
+# Pre-composited glow sprites kept by ModernUI (least recently used dropped first)
+GLOW_CACHE_SIZE = 128
+# Rendered text surfaces kept by render_text
+TEXT_CACHE_SIZE = 256
+# Most particles alive at once; emits beyond it are dropped
+PARTICLE_CAPACITY = 2048
+# Dirty-rectangle presentation (see DirtyRects); DIAMOND_DIRTY_RECTS=1 turns it on
+DIRTY_RECTS = os.environ.get('DIAMOND_DIRTY_RECTS', '0') == '1'
+# Flip the whole screen instead once the dirty rects cover this much of it
+DIRTY_FULL_FRACTION = 0.5
+# Frame rate while anything moves, and while idle (see FrameScheduler)
+FPS = 60
+IDLE_FPS = 10
+# Quiet time after the last input or animation before going idle (ms)
+IDLE_AFTER_MS = 1000
+# Frame profiler (see FrameProfiler): F3 shows the overlay, and
+# DIAMOND_PROFILE_TRACE=trace.csv (or .json) records every frame
+PROFILE_SECTIONS = ('ai', 'events', 'update', 'background', 'board', 'beads', 'panels', 'text',
+                    'particles', 'overlay', 'present', 'wait')
+PROFILE_WINDOW = 300  # frames behind the overlay's rolling percentiles
+PROFILE_OVERLAY_REFRESH_MS = 250
+PROFILE_TRACE = os.environ.get('DIAMOND_PROFILE_TRACE')
+
+
+class SpriteCache:
+    """Surfaces keyed by how they were drawn, evicting the least recently used"""
+    
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._sprites = OrderedDict()
+    
+    def get(self, key, make):
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            sprite = self._sprites[key] = make()
+            if len(self._sprites) > self.max_size:
+                self._sprites.popitem(last=False)
+        else:
+            self._sprites.move_to_end(key)
+        return sprite
+    
+    def clear(self):
+        self._sprites.clear()
+    
+    def __len__(self):
+        return len(self._sprites)
+
+
+_fonts = {}
+text_cache = SpriteCache(TEXT_CACHE_SIZE)
+
+
+def get_font(name, size):
+    # SysFont looks the font up and loads its file, far too slow to do per frame
+    key = (name, size)
+    if key not in _fonts:
+        _fonts[key] = pygame.font.SysFont(name, size)
+    return _fonts[key]
+
+
+def render_text(font, text, color):
+    # Antialiased render, cached; font.render ignores any alpha in color
+    color = tuple(color[:3])
+    return text_cache.get((font, text, color), lambda: font.render(text, True, color))
+
+
+class DirtyRects:
+    """
+    Screen regions that changed, so only they are sent to the display
+    
+    Frames are still painted in full into the screen surface; present()
+    then uploads the rects added this frame plus last frame's (whatever
+    moved away from there has to be erased too) with
+    pygame.display.update(rects). invalidate() makes the next present a
+    full flip, as do a disabled tracker and rects covering more than
+    DIRTY_FULL_FRACTION of the screen.
+    """
+    
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.rects = []
+        self._previous = []
+        self._full = True
+    
+    def add(self, rects):
+        # A Rect, a list of Rects, or None for nothing drawn
+        if not self.enabled or rects is None:
+            return
+        if isinstance(rects, pygame.Rect):
+            self.rects.append(rects)
+        else:
+            self.rects.extend(rects)
+    
+    def invalidate(self):
+        self._full = True
+    
+    def present(self):
+        full = not self.enabled or self._full
+        if not full:
+            # Static items add the same rect every frame; send each once
+            screen_rect = pygame.display.get_surface().get_rect()
+            rects = {tuple(screen_rect.clip(rect)) for rect in self._previous + self.rects}
+            area = sum(w * h for _, _, w, h in rects)
+            full = area > DIRTY_FULL_FRACTION * screen_rect.width * screen_rect.height
+        if full:
+            pygame.display.flip()
+        else:
+            pygame.display.update([rect for rect in rects if rect[2] and rect[3]])
+        self._previous = self.rects
+        self.rects = []
+        self._full = False
+
+
+dirty_rects = DirtyRects(DIRTY_RECTS)
+
+
+class FrameProfiler:
+    """
+    Time spent in each phase of a frame
+    
+    Game_Loop calls begin_frame(), then lap(section) after each phase
+    (PROFILE_SECTIONS), which charges the time since the previous lap to
+    that section, and end_frame(). The last PROFILE_WINDOW frames feed
+    the rolling percentiles of the overlay. A trace path ending in .json
+    gets Chrome trace events (chrome://tracing or Perfetto); any other
+    path gets one CSV row per frame, in milliseconds. While neither the
+    overlay nor a trace is on, every call returns straight away.
+    """
+    
+    def __init__(self, trace_path=None):
+        self.overlay = False
+        self.enabled = False
+        self._samples = {name: deque(maxlen=PROFILE_WINDOW) for name in PROFILE_SECTIONS + ('frame',)}
+        self._times = dict.fromkeys(PROFILE_SECTIONS, 0.0)
+        self._spans = []
+        self._start = self._last = self._origin = time.perf_counter()
+        self._frames = 0
+        self._overlay_surface = None
+        self._overlay_time = 0
+        self._trace = None
+        self._json = False
+        if trace_path:
+            self._trace = open(trace_path, 'w')
+            self._json = trace_path.endswith('.json')
+            if self._json:
+                self._trace.write('[')
+            else:
+                self._trace.write(','.join(('frame', 'time_ms') + PROFILE_SECTIONS + ('frame_ms',)) + '\n')
+    
+    def toggle_overlay(self):
+        # Takes effect from the next begin_frame
+        self.overlay = not self.overlay
+        self._overlay_surface = None
+    
+    def begin_frame(self):
+        self.enabled = self.overlay or self._trace is not None
+        if not self.enabled:
+            return
+        self._start = self._last = time.perf_counter()
+        for name in PROFILE_SECTIONS:
+            self._times[name] = 0.0
+        self._spans = []
+    
+    def lap(self, section):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._times[section] += now - self._last
+        if self._json:
+            self._spans.append((section, self._last, now))
+        self._last = now
+    
+    def end_frame(self):
+        if not self.enabled:
+            return
+        total = self._last - self._start
+        for name in PROFILE_SECTIONS:
+            self._samples[name].append(self._times[name])
+        self._samples['frame'].append(total)
+        self._frames += 1
+        if self._trace is not None:
+            self._write_trace(total)
+    
+    def _write_trace(self, total):
+        start_ms = (self._start - self._origin) * 1000
+        if not self._json:
+            row = [str(self._frames), '%.3f' % start_ms]
+            row += ['%.3f' % (self._times[name] * 1000) for name in PROFILE_SECTIONS]
+            row.append('%.3f' % (total * 1000))
+            self._trace.write(','.join(row) + '\n')
+            return
+        events = [{'name': 'frame', 'ph': 'X', 'pid': 1, 'tid': 1, 'ts': start_ms * 1000,
+                   'dur': total * 1e6, 'args': {'frame': self._frames}}]
+        events += [{'name': name, 'ph': 'X', 'pid': 1, 'tid': 1, 'ts': (begin - self._origin) * 1e6,
+                    'dur': (end - begin) * 1e6} for name, begin, end in self._spans]
+        self._trace.write(('\n' if self._frames == 1 else ',\n') + ',\n'.join(json.dumps(e) for e in events))
+    
+    def percentiles(self):
+        """{section: (p50, p95, max)} in milliseconds over the rolling window, 'frame' included"""
+        result = {}
+        for name, samples in self._samples.items():
+            if samples:
+                ordered = sorted(samples)
+                result[name] = (ordered[len(ordered) // 2] * 1000,
+                                ordered[min(len(ordered) - 1, len(ordered) * 95 // 100)] * 1000,
+                                ordered[-1] * 1000)
+        return result
+    
+    def draw_overlay(self, surface, pos=(20, 170)):
+        # Rebuilt a few times a second; in between the same surface is blitted
+        if not self.overlay:
+            return None
+        now = pygame.time.get_ticks()
+        if self._overlay_surface is None or now - self._overlay_time >= PROFILE_OVERLAY_REFRESH_MS:
+            self._overlay_surface = self._render_overlay()
+            self._overlay_time = now
+        return surface.blit(self._overlay_surface, pos)
+    
+    def _render_overlay(self):
+        overlay_font = get_font("Consolas", 16)
+        stats = self.percentiles()
+        rows = [('ms', 'p50', 'p95', 'max')]
+        for name in PROFILE_SECTIONS + ('frame',):
+            if name in stats:
+                rows.append((name,) + tuple('%.2f' % v for v in stats[name]))
+        if 'frame' in stats and stats['frame'][0] > 0:
+            rows.append(('fps (p50)', '%.1f' % (1000.0 / stats['frame'][0]), '', ''))
+        # Columns are laid out by width, so a proportional fallback font still lines up
+        rendered = [[overlay_font.render(cell, True, (220, 235, 255)) for cell in row] for row in rows]
+        widths = [max(row[i].get_width() for row in rendered) + 12 for i in range(4)]
+        line_height = overlay_font.get_linesize()
+        panel = pygame.Surface((sum(widths) + 8, line_height * len(rows) + 12), pygame.SRCALPHA)
+        pygame.draw.rect(panel, (0, 0, 0, 170), panel.get_rect(), border_radius=8)
+        for i, row in enumerate(rendered):
+            x = 8
+            for j, cell in enumerate(row):
+                # Section names left-aligned, timings right-aligned
+                panel.blit(cell, (x if j == 0 else x + widths[j] - 12 - cell.get_width(), 6 + i * line_height))
+                x += widths[j]
+        return panel
+    
+    def close(self):
+        if self._trace is not None:
+            if self._json:
+                self._trace.write('\n]\n')
+            self._trace.close()
+            self._trace = None
+
+
+class FrameScheduler:
+    """
+    Frame pacing that idles while nothing happens
+    
+    While something is active (reported to tick()) or for IDLE_AFTER_MS
+    after it, frames run at the full rate. After that the loop blocks in
+    pygame.event.wait for at most one idle frame, so any input wakes it at
+    once and brings back the full rate. The event that woke it is handed
+    out by the next events() call.
+    """
+    
+    def __init__(self, fps=FPS, idle_fps=IDLE_FPS, idle_after_ms=IDLE_AFTER_MS):
+        self.fps = fps
+        self.idle_fps = idle_fps
+        self.idle_after_ms = idle_after_ms
+        self.idle = False
+        self._pending = []
+        self._last_active = pygame.time.get_ticks()
+    
+    def events(self):
+        # Replaces pygame.event.get(); any input counts as activity
+        events = self._pending + pygame.event.get()
+        self._pending = []
+        if events:
+            self._last_active = pygame.time.get_ticks()
+        return events
+    
+    def tick(self, clock, active):
+        now = pygame.time.get_ticks()
+        if active:
+            self._last_active = now
+        self.idle = now - self._last_active >= self.idle_after_ms
+        if not self.idle:
+            clock.tick(self.fps)
+            return
+        event = pygame.event.wait(1000 // self.idle_fps)
+        if event.type != pygame.NOEVENT:
+            self._pending.append(event)
+            self._last_active = pygame.time.get_ticks()
+        # Keep clock.get_time() the real length of this frame
+        clock.tick()
+
 # Modern UI Components
 class ModernUI:
+    # Glow text and circles composited once on a transparent sprite; every
+    # layer shares one colour, so a single blit blends like the layered draws
+    glow_cache = SpriteCache(GLOW_CACHE_SIZE)
+    
     @staticmethod
     def draw_glassmorphic_panel(surface, rect, color, alpha=180):
         panel_surface = pygame.Surface((rect.width, rect.height), pygame.SRCALPHA)
@@ -49,29 +357,50 @@ class ModernUI:
                         width=2, border_radius=20)
         surface.blit(panel_surface, rect.topleft)
     
+    @classmethod
+    def draw_glowing_text(cls, surface, text, font, color, pos, glow_intensity=1):
+        glow = min(glow_intensity, 2)
+        sprite = cls.glow_cache.get(('text', text, font, tuple(color[:3]), glow),
+                                    lambda: cls._glowing_text_sprite(text, font, color, glow))
+        return surface.blit(sprite, sprite.get_rect(center=pos))
+    
     @staticmethod
-    def draw_glowing_text(surface, text, font, color, pos, glow_intensity=1):
-        for i in range(min(glow_intensity, 2), 0, -1):
+    def _glowing_text_sprite(text, font, color, glow):
+        text_surface = font.render(text, True, (*color[:3], 230))
+        # Room for the widest glow offset on every side, so the text stays centred
+        sprite = pygame.Surface((text_surface.get_width() + glow * 2, text_surface.get_height() + glow * 2),
+                                pygame.SRCALPHA)
+        for i in range(glow, 0, -1):
             glow_alpha = max(20, 60 // (i + 1))
             glow_surface = font.render(text, True, (*color[:3], glow_alpha))
-            glow_rect = glow_surface.get_rect(center=pos)
             for offset_x in range(-i, i+1):
                 for offset_y in range(-i, i+1):
                     if offset_x*offset_x + offset_y*offset_y <= i*i:
-                        surface.blit(glow_surface, (glow_rect.x + offset_x, glow_rect.y + offset_y))
-        text_surface = font.render(text, True, (*color[:3], 230))
-        text_rect = text_surface.get_rect(center=pos)
-        surface.blit(text_surface, text_rect)
+                        sprite.blit(glow_surface, (glow + offset_x, glow + offset_y))
+        sprite.blit(text_surface, (glow, glow))
+        return sprite
+    
+    @classmethod
+    def draw_glowing_circle(cls, surface, color, center, radius, glow_layers=2):
+        sprite = cls.glow_cache.get(('circle', tuple(color[:3]), radius, glow_layers),
+                                    lambda: cls._glowing_circle_sprite(color, radius, glow_layers))
+        outer = radius + glow_layers * 2
+        return surface.blit(sprite, (center[0] - outer - 1, center[1] - outer - 1))
     
     @staticmethod
-    def draw_glowing_circle(surface, color, center, radius, glow_layers=2):
+    def _glowing_circle_sprite(color, radius, glow_layers):
+        outer = radius + glow_layers * 2
+        sprite = pygame.Surface((outer * 2 + 2, outer * 2 + 2), pygame.SRCALPHA)
+        middle = (outer + 1, outer + 1)
         for i in range(glow_layers, 0, -1):
             alpha = max(20, 90 // (i + 1))
             glow_radius = radius + i * 2
             glow_surface = pygame.Surface((glow_radius * 2 + 2, glow_radius * 2 + 2), pygame.SRCALPHA)
             pygame.draw.circle(glow_surface, (*color[:3], alpha), (glow_radius + 1, glow_radius + 1), glow_radius)
-            surface.blit(glow_surface, (center[0] - glow_radius - 1, center[1] - glow_radius - 1))
-        pygame.draw.circle(surface, (*color[:3], 220), center, radius)
+            sprite.blit(glow_surface, (outer - glow_radius, outer - glow_radius))
+        # The screen has no alpha channel, so the bead itself was always drawn opaque
+        pygame.draw.circle(sprite, (*color[:3], 255), middle, radius)
+        return sprite
     
     @staticmethod
     def draw_glowing_line(surface, color, start, end, width=2, glow_layers=0):
@@ -81,22 +410,57 @@ class ModernUI:
     def draw_glowing_polygon(surface, color, points, width=2, glow_layers=0):
         pygame.draw.polygon(surface, (*color[:3], 180), points, width)
     
+    # Cached background gradient and the (size, refresh step) it was made for
+    _background = None
+    _background_key = None
+    
+    @classmethod
+    def draw_futuristic_background(cls, surface, time_offset=0):
+        # The colour shift is slow, so the gradient is rebuilt once per
+        # BACKGROUND_REFRESH_MS and every frame in between is a single blit
+        # Returns True when the gradient changed, i.e. the whole screen did
+        size = surface.get_size()
+        step = int(time_offset) // BACKGROUND_REFRESH_MS
+        rebuilt = cls._background_key != (size, step)
+        if rebuilt:
+            if cls._background is None or cls._background.get_size() != size:
+                cls._background = pygame.Surface(size).convert()
+            cls._render_background(cls._background, step * BACKGROUND_REFRESH_MS)
+            cls._background_key = (size, step)
+        surface.blit(cls._background, (0, 0))
+        return rebuilt
+    
     @staticmethod
-    def draw_futuristic_background(surface, time_offset=0):
-        for y in range(height):
-            progress = y / height
-            r = int(18 + 6 * math.sin(progress * 1.2 + time_offset * 0.0006))
-            g = int(22 + 8 * math.sin(progress * 1.5 + time_offset * 0.0007))
-            b = int(34 + 10 * math.sin(progress * 1.8 + time_offset * 0.0008))
-            pygame.draw.line(surface, (r, g, b), (0, y), (width, y))
-
-
-class ParticleSystem:
-    def __init__(self):
+    def _render_background(target, time_offset):
+        w, h = target.get_size()
+        if np is None:
+            for y in range(h):
+                progress = y / h
+                r = int(18 + 6 * math.sin(progress * 1.2 + time_offset * 0.0006))
+                g = int(22 + 8 * math.sin(progress * 1.5 + time_offset * 0.0007))
+                b = int(34 + 10 * math.sin(progress * 1.8 + time_offset * 0.0008))
+                pygame.draw.line(target, (r, g, b), (0, y), (w, y))
+            return
+        # One column of row colours, stretched across the width
+        progress = np.arange(h) / h
+        column = np.stack([18 + 6 * np.sin(progress * 1.2 + time_offset * 0.0006),
+                           22 + 8 * np.sin(progress * 1.5 + time_offset * 0.0007),
+                           34 + 10 * np.sin(progress * 1.8 + time_offset * 0.0008)], axis=1)
+        strip = pygame.surfarray.make_surface(column.astype(np.uint8)[None])
+        pygame.transform.scale(strip, (w, h), target)
+
+
+class SimpleParticleSystem:
+    # List-of-dicts particles, used when NumPy is not installed
+    def __init__(self, capacity=PARTICLE_CAPACITY):
         self.particles = []
+        self.capacity = capacity
+    
+    def __len__(self):
+        return len(self.particles)
     
     def emit(self, pos, color, count=16, velocity_range=3):
-        for _ in range(min(count, 20)):
+        for _ in range(min(count, 20, self.capacity - len(self.particles))):
             angle = random.uniform(0, 2 * math.pi)
             speed = random.uniform(0.6, velocity_range)
             velocity = [math.cos(angle) * speed, math.sin(angle) * speed]
@@ -111,7 +475,8 @@ class ParticleSystem:
             })
     
     def update(self):
-        for particle in self.particles[:]:
+        sparks = []
+        for particle in self.particles:
             particle['pos'][0] += particle['velocity'][0]
             particle['pos'][1] += particle['velocity'][1]
             particle['velocity'][1] += 0.12
@@ -121,7 +486,7 @@ class ParticleSystem:
                 particle['spark_timer'] = particle.get('spark_timer', 0) - 1
                 if particle['spark_timer'] <= 0:
                     particle['spark_timer'] = 3
-                    self.particles.append({
+                    sparks.append({
                         'pos': [particle['pos'][0], particle['pos'][1]],
                         'velocity': [random.uniform(-0.5, 0.5), random.uniform(-0.5, 0.5)],
                         'color': (255, 255, 255),
@@ -129,10 +494,11 @@ class ParticleSystem:
                         'max_lifetime': 18,
                         'size': 2
                     })
-            if particle['lifetime'] <= 0:
-                self.particles.remove(particle)
+        self.particles = [p for p in self.particles if p['lifetime'] > 0]
+        self.particles.extend(sparks[:self.capacity - len(self.particles)])
     
     def draw(self, surface):
+        rects = []
         for particle in self.particles:
             alpha = min(255, int(255 * (particle['lifetime'] / particle['max_lifetime'])))
             color = (*particle['color'][:3], alpha)
@@ -143,14 +509,16 @@ class ParticleSystem:
                 pygame.draw.rect(surf, color, pygame.Rect(0, 0, s * 2, s), border_radius=2)
                 rot = particle.get('rotation', 0.0)
                 rs = pygame.transform.rotate(surf, rot)
-                surface.blit(rs, (int(particle['pos'][0]), int(particle['pos'][1])))
+                rects.append(surface.blit(rs, (int(particle['pos'][0]), int(particle['pos'][1]))))
             else:
                 particle_surface = pygame.Surface((size * 2, size * 2), pygame.SRCALPHA)
                 pygame.draw.circle(particle_surface, color, (size, size), size)
-                surface.blit(particle_surface, (int(particle['pos'][0] - size), int(particle['pos'][1] - size)))
+                rects.append(surface.blit(particle_surface, (int(particle['pos'][0] - size),
+                                                             int(particle['pos'][1] - size))))
+        return rects[0].unionall(rects[1:]) if rects else None
 
     def emit_confetti(self, pos, base_color, count=24):
-        for _ in range(count):
+        for _ in range(min(count, self.capacity - len(self.particles))):
             angle = random.uniform(0, 2 * math.pi)
             speed = random.uniform(2, 6)
             velocity = [math.cos(angle) * speed, math.sin(angle) * speed]
@@ -171,6 +539,223 @@ class ParticleSystem:
             })
 
 
+# Particle kinds in ParticleSystem.kind
+DOT = 0
+CONFETTI = 1
+# Sprite atlas layout: dots by size (1-4) and alpha level, confetti by size
+# (2-4), rotation step and alpha level
+DOT_SIZES = 4
+DOT_ALPHA_LEVELS = 16
+CONFETTI_SIZES = 3
+CONFETTI_ANGLES = 12  # 15 degree steps over 180, a rectangle's symmetry
+CONFETTI_ALPHA_LEVELS = 8
+CONFETTI_SHADES = 8  # jittered colours per confetti base colour
+ATLAS_CELL = 12
+
+
+class ParticleSystem:
+    """
+    Fixed-capacity particle pool stored as NumPy arrays (one per field)
+    
+    update() integrates every particle at once and removes the dead by
+    moving live particles from the end of the pool into their slots. draw()
+    blits every particle from per-colour sprite atlases in one blits() call;
+    sizes, fade levels and confetti rotations are quantized to the atlas
+    cells.
+    """
+    
+    def __init__(self, capacity=PARTICLE_CAPACITY):
+        self.capacity = capacity
+        self.count = 0
+        self.pos = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.lifetime = np.zeros(capacity, dtype=np.int32)
+        self.max_lifetime = np.ones(capacity, dtype=np.int32)
+        self.size = np.zeros(capacity, dtype=np.int32)
+        self.kind = np.zeros(capacity, dtype=np.int8)
+        self.color = np.zeros(capacity, dtype=np.int32)  # index into self._colors
+        self.rotation = np.zeros(capacity)
+        self.rot_speed = np.zeros(capacity)
+        self.spark_timer = np.zeros(capacity, dtype=np.int32)
+        self._fields = (self.pos, self.velocity, self.lifetime, self.max_lifetime, self.size, self.kind,
+                        self.color, self.rotation, self.rot_speed, self.spark_timer)
+        self._rng = np.random.default_rng()
+        self._colors = []
+        self._color_ids = {}
+        self._atlases = {}  # (kind, colour id) -> atlas surface
+        self._shades = {}  # confetti base colour -> colour ids of its shades
+    
+    def __len__(self):
+        return self.count
+    
+    def _color_id(self, color):
+        color = tuple(int(c) for c in color[:3])
+        if color not in self._color_ids:
+            self._color_ids[color] = len(self._colors)
+            self._colors.append(color)
+        return self._color_ids[color]
+    
+    def _allocate(self, count):
+        # Slice of free slots for up to count new particles; the rest are dropped
+        count = max(0, min(count, self.capacity - self.count))
+        start = self.count
+        self.count += count
+        return slice(start, start + count)
+    
+    def _spawn(self, slots, pos, velocity, lifetime, max_lifetime, size, kind, color):
+        self.pos[slots] = pos
+        self.velocity[slots] = velocity
+        self.lifetime[slots] = lifetime
+        self.max_lifetime[slots] = max_lifetime
+        self.size[slots] = size
+        self.kind[slots] = kind
+        self.color[slots] = color
+        self.rotation[slots] = 0.0
+        self.rot_speed[slots] = 0.0
+        self.spark_timer[slots] = 0
+    
+    def emit(self, pos, color, count=16, velocity_range=3):
+        slots = self._allocate(min(count, 20))
+        n = slots.stop - slots.start
+        if not n:
+            return
+        angle = self._rng.uniform(0, 2 * math.pi, n)
+        speed = self._rng.uniform(0.6, velocity_range, n)
+        self._spawn(slots, pos, np.stack([np.cos(angle) * speed, np.sin(angle) * speed], axis=1),
+                    self._rng.integers(24, 49, n), 48, self._rng.integers(2, 5, n), DOT, self._color_id(color))
+    
+    def emit_confetti(self, pos, base_color, count=24):
+        slots = self._allocate(count)
+        n = slots.stop - slots.start
+        if not n:
+            return
+        base = tuple(base_color[:3])
+        if base not in self._shades:
+            def jitter(c):
+                return max(0, min(255, int(c + random.uniform(-80, 80))))
+            self._shades[base] = np.array([self._color_id(tuple(jitter(c) for c in base))
+                                           for _ in range(CONFETTI_SHADES)])
+        angle = self._rng.uniform(0, 2 * math.pi, n)
+        speed = self._rng.uniform(2, 6, n)
+        self._spawn(slots, pos, np.stack([np.cos(angle) * speed, np.sin(angle) * speed], axis=1),
+                    self._rng.integers(30, 61, n), 60, self._rng.integers(2, 5, n), CONFETTI,
+                    self._rng.choice(self._shades[base], n))
+        self.rotation[slots] = self._rng.uniform(0, 360, n)
+        self.rot_speed[slots] = self._rng.uniform(-10, 10, n)
+        self.spark_timer[slots] = self._rng.integers(0, 4, n)
+    
+    def update(self):
+        n = self.count
+        if not n:
+            return
+        live = slice(0, n)
+        self.pos[live] += self.velocity[live]
+        self.velocity[live, 1] += 0.12
+        self.lifetime[live] -= 1
+        
+        # Confetti spins and leaves a short-lived spark every 3 frames
+        confetti = self.kind[live] == CONFETTI
+        self.rotation[live][confetti] += self.rot_speed[live][confetti]
+        self.spark_timer[live][confetti] -= 1
+        sparking = np.flatnonzero(confetti & (self.spark_timer[live] <= 0))
+        self.spark_timer[sparking] = 3
+        sources = self.pos[sparking]
+        
+        # Swap-remove: live particles past the new end fill the dead slots before it
+        alive = self.lifetime[live] > 0
+        remaining = int(alive.sum())
+        holes = np.flatnonzero(~alive[:remaining])
+        movers = np.flatnonzero(alive[remaining:]) + remaining
+        for field in self._fields:
+            field[holes] = field[movers]
+        self.count = remaining
+        
+        slots = self._allocate(len(sources))
+        k = slots.stop - slots.start
+        if k:
+            self._spawn(slots, sources[:k], self._rng.uniform(-0.5, 0.5, (k, 2)), 18, 18, 2, DOT,
+                        self._color_id((255, 255, 255)))
+    
+    def _atlas(self, kind, color_id):
+        atlas = self._atlases.get((kind, color_id))
+        if atlas is None:
+            atlas = self._atlases[(kind, color_id)] = _build_particle_atlas(kind, self._colors[color_id])
+        return atlas
+    
+    def draw(self, surface):
+        n = self.count
+        if not n:
+            return None
+        fade = self.lifetime[:n] / self.max_lifetime[:n]
+        alpha = np.minimum(255, (255 * fade).astype(np.int32))
+        size = np.maximum(1, (self.size[:n] * fade).astype(np.int32))
+        x, y = self.pos[:n, 0], self.pos[:n, 1]
+        
+        confetti = self.kind[:n] == CONFETTI
+        dot_cell = (size - 1) * DOT_ALPHA_LEVELS + alpha * DOT_ALPHA_LEVELS // 256
+        angle = np.round(self.rotation[:n] / (180.0 / CONFETTI_ANGLES)).astype(np.int64) % CONFETTI_ANGLES
+        confetti_cell = ((np.maximum(2, size) - 2) * CONFETTI_ANGLES + angle) * CONFETTI_ALPHA_LEVELS \
+            + alpha * CONFETTI_ALPHA_LEVELS // 256
+        cell = np.where(confetti, confetti_cell, dot_cell)
+        # Dots are centred on their position, confetti hangs from its top-left corner
+        dest_x = np.where(confetti, x, x - size).astype(np.int32)
+        dest_y = np.where(confetti, y, y - size).astype(np.int32)
+        
+        areas = (DOT_AREAS, CONFETTI_AREAS)
+        surface.blits([(self._atlas(k, c), (dx, dy), areas[k][i]) for k, c, i, dx, dy in
+                       zip(self.kind[:n].tolist(), self.color[:n].tolist(), cell.tolist(),
+                           dest_x.tolist(), dest_y.tolist())], doreturn=False)
+        left, top = int(dest_x.min()), int(dest_y.min())
+        return pygame.Rect(left, top, int(dest_x.max()) - left + ATLAS_CELL, int(dest_y.max()) - top + ATLAS_CELL)
+
+
+def _particle_sprite(kind, color, size, alpha, angle):
+    # One particle exactly as the dict-based system drew it
+    if kind == CONFETTI:
+        surf = pygame.Surface((size * 2, size), pygame.SRCALPHA)
+        pygame.draw.rect(surf, (*color, alpha), pygame.Rect(0, 0, size * 2, size), border_radius=2)
+        return pygame.transform.rotate(surf, angle)
+    surf = pygame.Surface((size * 2, size * 2), pygame.SRCALPHA)
+    pygame.draw.circle(surf, (*color, alpha), (size, size), size)
+    return surf
+
+
+def _atlas_cells(kind):
+    # (size, alpha, angle) of every atlas cell, in cell index order
+    if kind == CONFETTI:
+        return [(size, (level + 1) * 256 // CONFETTI_ALPHA_LEVELS - 1, step * 180.0 / CONFETTI_ANGLES)
+                for size in range(2, 2 + CONFETTI_SIZES)
+                for step in range(CONFETTI_ANGLES)
+                for level in range(CONFETTI_ALPHA_LEVELS)]
+    return [(size, (level + 1) * 256 // DOT_ALPHA_LEVELS - 1, 0)
+            for size in range(1, DOT_SIZES + 1)
+            for level in range(DOT_ALPHA_LEVELS)]
+
+
+def _atlas_areas(kind):
+    # Rect of each cell's sprite within the atlas (sprite sizes do not depend on colour)
+    areas = []
+    for i, cell in enumerate(_atlas_cells(kind)):
+        w, h = _particle_sprite(kind, (0, 0, 0), *cell).get_size()
+        areas.append(pygame.Rect(i % 32 * ATLAS_CELL, i // 32 * ATLAS_CELL, w, h))
+    return areas
+
+
+def _build_particle_atlas(kind, color):
+    cells = _atlas_cells(kind)
+    atlas = pygame.Surface((32 * ATLAS_CELL, (len(cells) + 31) // 32 * ATLAS_CELL), pygame.SRCALPHA)
+    for i, cell in enumerate(cells):
+        atlas.blit(_particle_sprite(kind, color, *cell), (i % 32 * ATLAS_CELL, i // 32 * ATLAS_CELL))
+    return atlas
+
+
+if np is None:
+    ParticleSystem = SimpleParticleSystem
+else:
+    DOT_AREAS = _atlas_areas(DOT)
+    CONFETTI_AREAS = _atlas_areas(CONFETTI)
+
+
 class FloatingTextSystem:
     def __init__(self):
         self.items = []  # each: {text,pos,vel,color,life,max}
@@ -195,14 +780,15 @@ class FloatingTextSystem:
                 self.items.remove(it)
     
     def draw(self, surface):
+        rects = []
         for it in self.items:
-            alpha = int(255 * (it['life'] / it['max']))
-            color = (*it['color'][:3], alpha)
-            surf = self.font.render(it['text'], True, color)
-            shadow = self.font.render(it['text'], True, (0,0,0))
+            surf = render_text(self.font, it['text'], it['color'])
+            shadow = render_text(self.font, it['text'], (0,0,0))
             rect = surf.get_rect(center=(int(it['pos'][0]), int(it['pos'][1])))
             surface.blit(shadow, (rect.x+2, rect.y+2))
             surface.blit(surf, rect)
+            rects.append(rect.inflate(4, 4))
+        return rects
 
 class ModernButton:
     def __init__(self, x, y, width, height, text, font, base_color, hover_color, text_color=(255, 255, 255)):
@@ -278,6 +864,8 @@ class ModernButton:
             surface.blit(ripple_surf, (rx-rr, ry-rr))
             if self.ripple['alpha'] == 0:
                 self.ripple = None
+            return [scaled_rect.inflate(4, 4), ripple_surf.get_rect(topleft=(rx-rr, ry-rr))]
+        return scaled_rect.inflate(4, 4)
 
 
 class ImageButton:
@@ -361,6 +949,8 @@ class ImageButton:
                 shadow = self.label_font.render(self.label, True, (0,0,0))
                 surface.blit(shadow, (text_rect.x+dx, text_rect.y+dy))
             surface.blit(text_surface, text_rect)
+        outer = glow_radius + 25
+        return pygame.Rect(self.rect.centerx - outer, self.rect.centery - outer, outer * 2, outer * 2)
 
 
 class MinimalButton:
@@ -539,14 +1129,16 @@ class DiamondAnimation:
         
         pygame.draw.polygon(surface, (100, 200, 255), points)
         pygame.draw.polygon(surface, (150, 220, 255), points, 3)
+        return pygame.Rect(int(self.x - self.size * 2), int(self.y - self.size * 2),
+                           int(self.size * 4) + 1, int(self.size * 4) + 1)
 
 
 def draw_winner_banner(surface, text, color, center_y, time_ms):
     # Animated banner with scale pulse, shadow, underline glow, and color sweep
     pulse = 1.0 + 0.05 * math.sin(time_ms * 0.005)
-    base_font = pygame.font.SysFont("Segoe UI Black", int(74 * pulse))
+    base_font = get_font("Segoe UI Black", int(74 * pulse))
     # Create gradient sweep
-    text_mask = base_font.render(text, True, (255, 255, 255))
+    text_mask = render_text(base_font, text, (255, 255, 255))
     w, h = text_mask.get_size()
     gradient = pygame.Surface((w, h), pygame.SRCALPHA)
     for x in range(w):
@@ -558,7 +1150,7 @@ def draw_winner_banner(surface, text, color, center_y, time_ms):
         pygame.draw.line(gradient, (r, g, b, 230), (x, 0), (x, h))
     colored_text = gradient.copy()
     colored_text.blit(text_mask, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
-    outline_surface = base_font.render(text, True, (0, 0, 0))
+    outline_surface = render_text(base_font, text, (0, 0, 0))
     # Position centered
     target_rect = colored_text.get_rect(center=(width // 2, center_y))
     # Multi-shadow for depth
@@ -589,22 +1181,25 @@ def draw_score_panel(surface, text, score, pos, color, pulse_time):
     ModernUI.draw_glassmorphic_panel(surface, panel_rect, color, alpha=200)
     
     text_y = panel_rect.centery - 20
-    font_score = pygame.font.SysFont("Segoe UI Black", 30)
+    font_score = get_font("Segoe UI Black", 30)
     # render label like the number (solid with subtle shadow)
-    label_surface = font_score.render(text, True, (255, 255, 255))
-    label_shadow = font_score.render(text, True, (0, 0, 0))
+    label_surface = render_text(font_score, text, (255, 255, 255))
+    label_shadow = render_text(font_score, text, (0, 0, 0))
     label_target = label_surface.get_rect(center=(panel_rect.centerx, text_y))
     surface.blit(label_shadow, (label_target.x + 2, label_target.y + 2))
     surface.blit(label_surface, label_target)
     
     score_y = panel_rect.centery + 20
-    score_font = pygame.font.SysFont("Segoe UI Black", int(64 * pulse))
+    # The pulse only spans a few whole font sizes, so each size and score is
+    # rendered once and then served from the cache
+    score_font = get_font("Segoe UI Black", int(64 * pulse))
     # render bright white score with subtle shadow for readability
-    score_surface = score_font.render(str(score), True, (255, 255, 255))
-    shadow_surface = score_font.render(str(score), True, (0, 0, 0))
+    score_surface = render_text(score_font, str(score), (255, 255, 255))
+    shadow_surface = render_text(score_font, str(score), (0, 0, 0))
     target = score_surface.get_rect(center=(panel_rect.centerx, score_y))
     surface.blit(shadow_surface, (target.x + 2, target.y + 2))
     surface.blit(score_surface, target)
+    return panel_rect.union(target.inflate(4, 4))
 
 
 center_x = width // 2
@@ -673,6 +1268,17 @@ def Get_First_Hop_Neighbour():
 
 
 neighbour = Get_First_Hop_Neighbour()
+board_layout = Layout.from_neighbour(neighbour)
+
+# Topology compiled to node indices once; pixels are only used for drawing and hit-testing
+NODE_POS = board_layout.coords  # node index -> pixel
+NODE_ID = board_layout.index  # pixel -> node index
+NODE_NEIGHBOURS = tuple(tuple(NODE_ID[item] for item in neighbour[NODE_POS[i]]) for i in range(NUM_NODES))
+
+# Occupancy array values
+EMPTY = 0
+AI_BEAD = 1
+HUMAN_BEAD = 2
 
 text_font = pygame.font.SysFont("Calibri", 24)
 text_font_won = pygame.font.SysFont("Bahnschrift SemiBold", 40)
@@ -694,11 +1300,11 @@ def draw_centered_text_below(text, font, color, rect, margin):
 
 
 def Draw_Circle(ara, color):
-    for item in ara:
-        ModernUI.draw_glowing_circle(screen, color, item, 10, glow_layers=5)
+    return [ModernUI.draw_glowing_circle(screen, color, item, 10, glow_layers=5) for item in ara]
 
 
 def Find_Match(ara, pos):
+    # Hit-test: the point of ara within 40px of pos (e.g. the mouse)
     for item in ara:
         x = item[0]
         y = item[1]
@@ -707,20 +1313,14 @@ def Find_Match(ara, pos):
     return -1, -1
 
 
-def Heuristic_Val(pos, neighbour, ai_beads, human_beads):
-    ara = neighbour[pos]
-    count = len(ara)
-    
-    for item in ara:
-        x, y = Find_Match(ai_beads, item)
-        if x != -1:
-            count -= 1
-            continue
-        x, y = Find_Match(human_beads, item)
-        if x != -1:
-            count -= 1
-    
-    return count
+def Occupancy(ai_beads, human_beads):
+    # EMPTY / AI_BEAD / HUMAN_BEAD for every node index
+    occupied = bytearray(NUM_NODES)
+    for item in ai_beads:
+        occupied[NODE_ID[item]] = AI_BEAD
+    for item in human_beads:
+        occupied[NODE_ID[item]] = HUMAN_BEAD
+    return occupied
 
 
 def Check_Winner(ai_beads_position, human_beads_position):
@@ -732,159 +1332,56 @@ def Check_Winner(ai_beads_position, human_beads_position):
         return -1
 
 
-def Trap_Beads(x, y, neighbour, color, ai_beads, human_beads):
-    ara = neighbour[(x, y)]
-    count = len(ara)
-    count2 = 0
-    
-    for item in ara:
-        x, y = Find_Match(ai_beads, item)
-        if x != -1:
-            count -= 1
-            if color == GREEN:
-                count2 += 1
-                continue
-        
-        x, y = Find_Match(human_beads, item)
-        if x != -1:
-            count -= 1
-            if color == RED:
-                count2 += 1
-                continue
-    return count, count2
-
-
-def Draw_Polygon():
-    ModernUI.draw_glowing_polygon(screen, COLOR_PRIMARY, [top, right, bottom, left], width=3)
-    ModernUI.draw_glowing_polygon(screen, COLOR_PRIMARY, [center_t_up, center_r, center_t_down, center_l], width=3)
-    ModernUI.draw_glowing_polygon(screen, COLOR_PRIMARY, [top, top_l, top_t, top_r], width=3)
-    ModernUI.draw_glowing_polygon(screen, COLOR_PRIMARY, [right_l, right, right_r, right_t], width=3)
-    ModernUI.draw_glowing_polygon(screen, COLOR_PRIMARY, [bottom_r, bottom_t, bottom_l, bottom], width=3)
-    ModernUI.draw_glowing_polygon(screen, COLOR_PRIMARY, [left_l, left_t, left_r, left], width=3)
-
-
-def Heuristic_Value_Min_Max(pos, ara_ai, ara_human):
-    ara = neighbour[pos]
-    count = len(ara)
-    for item in ara:
-        x, y = Find_Match(ara_ai, item)
-        p, q = Find_Match(ara_human, item)
-        if x != -1 or p != -1:
-            count -= 1
-    return count
+def Draw_Polygon(surface=None):
+    if surface is None:
+        surface = screen
+    ModernUI.draw_glowing_polygon(surface, COLOR_PRIMARY, [top, right, bottom, left], width=3)
+    ModernUI.draw_glowing_polygon(surface, COLOR_PRIMARY, [center_t_up, center_r, center_t_down, center_l], width=3)
+    ModernUI.draw_glowing_polygon(surface, COLOR_PRIMARY, [top, top_l, top_t, top_r], width=3)
+    ModernUI.draw_glowing_polygon(surface, COLOR_PRIMARY, [right_l, right, right_r, right_t], width=3)
+    ModernUI.draw_glowing_polygon(surface, COLOR_PRIMARY, [bottom_r, bottom_t, bottom_l, bottom], width=3)
+    ModernUI.draw_glowing_polygon(surface, COLOR_PRIMARY, [left_l, left_t, left_r, left], width=3)
 
 
-def Empty_Neighbour(node, ai_beads, human_beads):
-    ara = neighbour[node]
-    ara1 = []
-    
-    for item in ara:
-        x, y = Find_Match(ai_beads, item)
-        if x != -1:
-            continue
-        x, y = Find_Match(human_beads, item)
-        if x != -1:
-            continue
-        ara1.append(item)
-    
-    return ara1
-
-
-def All_Heuristic_Value_Min_Max_Ai(ara_ai, ara_human):
-    result = []
-    for item in ara_ai:
-        x = Heuristic_Value_Min_Max(item, ara_ai, ara_human)
-        result.append(x)
-    return result
-
-
-def All_Heuristic_Value_Min_Max_Human(ara_ai, ara_human):
-    result = []
-    for item in ara_human:
-        x = Heuristic_Value_Min_Max(item, ara_ai, ara_human)
-        result.append(x)
-    return result
-
-def _mini_max_ab(ara_ai, ara_human, depth, maxPlayer, alpha, beta):
-    best_item = None
-    best_node = None
-
-    # Leaf evaluation
-    if depth == 0:
-        result1 = All_Heuristic_Value_Min_Max_Ai(ara_ai, ara_human)
-        result2 = All_Heuristic_Value_Min_Max_Human(ara_ai, ara_human)
-        return (sum(result1) - sum(result2)) + len(ara_ai) - len(ara_human), best_item, best_node
-
-    if maxPlayer:
-        maxEle = -math.inf
-        best_item = None
-        best_node = None
-        for node in ara_ai:
-            val = Heuristic_Val(node, neighbour, ara_ai, ara_human)
-            if val == 0:
-                continue
-            else:
-                ara = Empty_Neighbour(node, ara_ai, ara_human)
-                for item in ara:
-                    temp_ai = copy.deepcopy(ara_ai)
-                    x, y = Find_Match(temp_ai, item)
-                    p, q = Find_Match(ara_human, item)
-                    if x != -1 or p != -1:
-                        continue
-                    temp_ai.append(item)
-                    temp_ai.remove(node)
-                    result, _, _ = _mini_max_ab(temp_ai, ara_human, depth - 1, False, alpha, beta)
-                    if result > maxEle:
-                        maxEle = result
-                        best_item = item
-                        best_node = node
-
-                    # alpha-beta update and prune
-                    alpha = max(alpha, result)
-                    if beta <= alpha:
-                        break
-                if beta <= alpha:
-                    break
-        # if no moves were found, return very low score (same shape as original)
-        if best_item is None:
-            return maxEle, best_item, best_node
-        return maxEle, best_item, best_node
-    else:
-        minEle = math.inf
-        best_item = None
-        best_node = None
-        for node in ara_human:
-            val = Heuristic_Val(node, neighbour, ara_ai, ara_human)
-            if val == 0:
-                continue
-            else:
-                ara = Empty_Neighbour(node, ara_ai, ara_human)
-                for item in ara:
-                    temp_human = copy.deepcopy(ara_human)
-                    x, y = Find_Match(ara_ai, item)
-                    p, q = Find_Match(temp_human, item)
-                    if x != -1 or p != -1:
-                        continue
-                    temp_human.append(item)
-                    temp_human.remove(node)
-                    result, _, _ = _mini_max_ab(ara_ai, temp_human, depth - 1, True, alpha, beta)
-                    if result < minEle:
-                        minEle = result
-                        best_item = item
-                        best_node = node
-
-                    # alpha-beta update and prune
-                    beta = min(beta, result)
-                    if beta <= alpha:
-                        break
-                if beta <= alpha:
-                    break
-        if best_item is None:
-            return minEle, best_item, best_node
-        return minEle, best_item, best_node
-
-def Mini_Max_Move(ara_ai, ara_human, depth, maxPlayer):
-    return _mini_max_ab(ara_ai, ara_human, depth, maxPlayer, -math.inf, math.inf)
+# Static board (diagonals and rhombi) rendered once; see Draw_Board
+BOARD_COLORKEY = (255, 0, 255)
+board_layer = None  # (surface, top-left, display size it was made for)
+
+
+def Draw_Board(surface):
+    # The board never moves, so it is drawn once onto an opaque layer whose
+    # BOARD_COLORKEY background is skipped when blitting; opaque like the
+    # screen itself, it gives the same pixels as drawing directly
+    global board_layer
+    if board_layer is None or board_layer[2] != surface.get_size():
+        full = pygame.Surface(surface.get_size()).convert()
+        full.fill(BOARD_COLORKEY)
+        ModernUI.draw_glowing_line(full, COLOR_PRIMARY, top, bottom, width=2)
+        ModernUI.draw_glowing_line(full, COLOR_PRIMARY, right, left, width=2)
+        Draw_Polygon(full)
+        # Keep only the part the board covers
+        full.set_colorkey(BOARD_COLORKEY)
+        bounds = full.get_bounding_rect()
+        layer = full.subsurface(bounds).copy()
+        layer.set_colorkey(BOARD_COLORKEY, pygame.RLEACCEL)
+        board_layer = (layer, bounds.topleft, surface.get_size())
+    surface.blit(board_layer[0], board_layer[1])
+
+
+def Invalidate_Display_Caches():
+    # Called after set_mode recreates the display: cached layers are rebuilt
+    # in the new display's pixel format on their next draw
+    global board_layer
+    board_layer = None
+    ModernUI._background = ModernUI._background_key = None
+    dirty_rects.invalidate()
+
+
+def Empty_Neighbour(node, ai_beads, human_beads, occupied=None):
+    # Pixel positions of the free neighbours of node, in Get_First_Hop_Neighbour order
+    if occupied is None:
+        occupied = Occupancy(ai_beads, human_beads)
+    return [NODE_POS[n] for n in NODE_NEIGHBOURS[NODE_ID[node]] if occupied[n] == EMPTY]
 
 
 
@@ -905,6 +1402,18 @@ GAME_OVER = 3
 MINIMAX_AI = 0
 ASTAR_FUZZY_AI = 1
 
+# Minimax think time per move (seconds); matches the MCTS budgets
+MINIMAX_TIME_LIMIT = 1.5
+MINIMAX_TIME_LIMIT_FAST = 0.15
+MINIMAX_MAX_DEPTH = 32
+
+# Optional endgame tablebase, generated with: python -m engine.tablebase build endgame.tb
+TABLEBASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'endgame.tb')
+endgame_tablebase = Tablebase.open_if_exists(TABLEBASE_PATH)
+# Optional opening book, generated with: python -m engine.book build opening.book
+OPENING_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening.book')
+opening_book = OpeningBook.open_if_exists(OPENING_BOOK_PATH)
+
 AI_VS_HUMAN = 0
 AI_VS_AI = 1
 
@@ -913,6 +1422,8 @@ def Game_Loop():
     global screen
     running = True
     clock = pygame.time.Clock()
+    frame_scheduler = FrameScheduler()
+    profiler = FrameProfiler(PROFILE_TRACE)
     
     ara = []
     start_time = pygame.time.get_ticks()
@@ -941,8 +1452,17 @@ def Game_Loop():
     ui_human_score = 0.0
     diamond_anim = DiamondAnimation(width // 2, 100, 40)
     
-    astar_fuzzy_ai = AStarFuzzyAI(game_state, fast_mode=True)
-    astar_fuzzy_ai_full = AStarFuzzyAI(game_state, fast_mode=False)
+    astar_fuzzy_ai = AStarFuzzyAI(game_state, fast_mode=True, plays_ai=False, tablebase=endgame_tablebase,
+                                  book=opening_book)
+    astar_fuzzy_ai_full = AStarFuzzyAI(game_state, fast_mode=False, tablebase=endgame_tablebase, book=opening_book)
+    # AI searches run in a worker process that holds the engines, so they
+    # neither share the GIL with rendering nor lose their tables between
+    # moves; cancelled on ESC/BACK/RESTART
+    ai_search = SearchWorker({
+        'minimax': MinimaxAI(neighbour, tablebase=endgame_tablebase, book=opening_book),
+        'mcts_fast': astar_fuzzy_ai,
+        'mcts_full': astar_fuzzy_ai_full,
+    })
     
     # Load images
     ai_img = pygame.image.load("robot.png").convert_alpha()
@@ -975,7 +1495,9 @@ def Game_Loop():
     last_move_effect = None  # {'start':(x,y),'end':(x,y),'start_time':ms,'duration':ms}
     
     last_fs_check = 0
+    drawn_screen = None  # screen shown last frame; switching screens repaints everything
     while running:
+        profiler.begin_frame()
         dt = clock.get_time()
         current_time = pygame.time.get_ticks()
         mouse_pos = pygame.mouse.get_pos()
@@ -989,6 +1511,7 @@ def Game_Loop():
                     screen = pygame.display.set_mode((info.current_w, info.current_h), pygame.FULLSCREEN | pygame.SCALED)
                 except pygame.error:
                     screen = pygame.display.set_mode((info.current_w, info.current_h), pygame.FULLSCREEN)
+                Invalidate_Display_Caches()
             last_fs_check = current_time
         
         # Handle AI moves
@@ -997,155 +1520,178 @@ def Game_Loop():
                 if current_time - last_ai_move_time > simulation_delay:
                     if ai_vs_ai_stuck_counter >= max_stuck_moves:
                         print("Game stuck - declaring draw")
+                        ai_search.cancel()
                         current_screen = GAME_OVER
                         winner = True
                     elif ai_move and not human_move:
-                        ara_ai_1 = copy.deepcopy(game_state.ai_beads_position)
-                        ara_human_1 = copy.deepcopy(game_state.human_beads_position)
-                        result1, i1, n1 = Mini_Max_Move(ara_ai_1, ara_human_1, 2, True)
-                        moved = False
+                        # Search in the background and pick the result up on a later frame
+                        if not ai_search.busy:
+                            ara_ai_1 = copy.deepcopy(game_state.ai_beads_position)
+                            ara_human_1 = copy.deepcopy(game_state.human_beads_position)
+                            ai_search.submit('minimax', 'get_best_move', ara_ai_1, ara_human_1, MINIMAX_MAX_DEPTH, True,
+                                             MINIMAX_TIME_LIMIT_FAST)
+                        done, search_result = ai_search.poll()
+                        if done:
+                            result1, i1, n1 = search_result
+                            moved = False
                         
-                        ai_bead_count = len(game_state.ai_beads_position)
-                        human_bead_count = len(game_state.human_beads_position)
-                        has_advantage = ai_bead_count > human_bead_count
+                            ai_bead_count = len(game_state.ai_beads_position)
+                            human_bead_count = len(game_state.human_beads_position)
+                            has_advantage = ai_bead_count > human_bead_count
                         
-                        if n1 and i1 and n1 in game_state.ai_beads_position:
-                            neighbors = Empty_Neighbour(i1, game_state.ai_beads_position, game_state.human_beads_position)
-                            trap_potential = 0
-                            for neighbor in neighbors:
-                                neighbor_neighbors = Empty_Neighbour(neighbor, game_state.ai_beads_position, game_state.human_beads_position)
-                                if len(neighbor_neighbors) <= 1:
-                                    trap_potential += 1
+                            if n1 and i1 and n1 in game_state.ai_beads_position:
+                                occupied = Occupancy(game_state.ai_beads_position, game_state.human_beads_position)
+                                neighbors = Empty_Neighbour(i1, None, None, occupied)
+                                trap_potential = 0
+                                for neighbor in neighbors:
+                                    neighbor_neighbors = Empty_Neighbour(neighbor, None, None, occupied)
+                                    if len(neighbor_neighbors) <= 1:
+                                        trap_potential += 1
                             
-                            if trap_potential > 0 or len(neighbors) > 2 or has_advantage:
-                                game_state.ai_beads_position.remove(n1)
-                                game_state.ai_beads_position.append(i1)
-                                particle_system.emit(i1, COLOR_AI, count=15)
-                                moved = True
-                            else:
-                                best_strategic_move = None
-                                best_score = -1
+                                if trap_potential > 0 or len(neighbors) > 2 or has_advantage:
+                                    game_state.ai_beads_position.remove(n1)
+                                    game_state.ai_beads_position.append(i1)
+                                    particle_system.emit(i1, COLOR_AI, count=15)
+                                    moved = True
+                                else:
+                                    best_strategic_move = None
+                                    best_score = -1
                                 
-                                for bead in game_state.ai_beads_position:
-                                    bead_neighbors = Empty_Neighbour(bead, game_state.ai_beads_position, game_state.human_beads_position)
-                                    for target in bead_neighbors:
-                                        score = 0
-                                        target_neighbors = Empty_Neighbour(target, game_state.ai_beads_position, game_state.human_beads_position)
-                                        score += len(target_neighbors)
+                                    for bead in game_state.ai_beads_position:
+                                        bead_neighbors = Empty_Neighbour(bead, None, None, occupied)
+                                        for target in bead_neighbors:
+                                            score = 0
+                                            target_neighbors = Empty_Neighbour(target, None, None, occupied)
+                                            score += len(target_neighbors)
                                         
-                                        for tn in target_neighbors:
-                                            tn_neighbors = Empty_Neighbour(tn, game_state.ai_beads_position, game_state.human_beads_position)
-                                            if len(tn_neighbors) <= 1:
-                                                score += 10
+                                            for tn in target_neighbors:
+                                                tn_neighbors = Empty_Neighbour(tn, None, None, occupied)
+                                                if len(tn_neighbors) <= 1:
+                                                    score += 10
                                         
-                                        if has_advantage:
-                                            score += 20
+                                            if has_advantage:
+                                                score += 20
                                         
-                                        if score > best_score:
-                                            best_score = score
-                                            best_strategic_move = (bead, target)
+                                            if score > best_score:
+                                                best_score = score
+                                                best_strategic_move = (bead, target)
                                 
-                                if best_strategic_move:
-                                    recent_move = (best_strategic_move[0], best_strategic_move[1])
-                                    if recent_move not in move_history[-4:]:
-                                        game_state.ai_beads_position.remove(best_strategic_move[0])
-                                        game_state.ai_beads_position.append(best_strategic_move[1])
-                                        particle_system.emit(best_strategic_move[1], COLOR_AI, count=15)
-                                        move_history.append(recent_move)
-                                        moved = True
+                                    if best_strategic_move:
+                                        recent_move = (best_strategic_move[0], best_strategic_move[1])
+                                        if recent_move not in move_history[-4:]:
+                                            game_state.ai_beads_position.remove(best_strategic_move[0])
+                                            game_state.ai_beads_position.append(best_strategic_move[1])
+                                            particle_system.emit(best_strategic_move[1], COLOR_AI, count=15)
+                                            move_history.append(recent_move)
+                                            moved = True
                         
-                        if not moved:
-                            for bead in game_state.ai_beads_position:
-                                neighbors = Empty_Neighbour(bead, game_state.ai_beads_position, game_state.human_beads_position)
-                                if neighbors:
-                                    game_state.ai_beads_position.remove(bead)
-                                    game_state.ai_beads_position.append(neighbors[0])
-                                    particle_system.emit(neighbors[0], COLOR_AI, count=15)
-                                    move_history.append((bead, neighbors[0]))
-                                    moved = True
-                                    break
+                            if not moved:
+                                for bead in game_state.ai_beads_position:
+                                    neighbors = Empty_Neighbour(bead, game_state.ai_beads_position, game_state.human_beads_position)
+                                    if neighbors:
+                                        game_state.ai_beads_position.remove(bead)
+                                        game_state.ai_beads_position.append(neighbors[0])
+                                        particle_system.emit(neighbors[0], COLOR_AI, count=15)
+                                        move_history.append((bead, neighbors[0]))
+                                        moved = True
+                                        break
                         
-                        if not moved:
-                            ai_vs_ai_stuck_counter += 1
-                        else:
-                            ai_vs_ai_stuck_counter = 0
+                            if not moved:
+                                ai_vs_ai_stuck_counter += 1
+                            else:
+                                ai_vs_ai_stuck_counter = 0
                         
-                        ai_move = False
-                        human_move = True
-                        last_ai_move_time = current_time
+                            ai_move = False
+                            human_move = True
+                            last_ai_move_time = current_time
                     elif human_move and not ai_move:
-                        astar_fuzzy_ai.update_game_state(game_state.ai_beads_position, game_state.human_beads_position)
-                        
-                        best_move = astar_fuzzy_ai.get_best_move(game_state.human_beads_position[0] if game_state.human_beads_position else (0, 0))
-                        
-                        moved = False
-                        if best_move and best_move[0] != best_move[1] and best_move[0] in game_state.human_beads_position:
-                            recent_move = (best_move[0], best_move[1])
-                            if recent_move not in move_history[-4:]:
-                                game_state.human_beads_position.remove(best_move[0])
-                                game_state.human_beads_position.append(best_move[1])
-                                particle_system.emit(best_move[1], COLOR_HUMAN, count=15)
-                                move_history.append(recent_move)
-                                moved = True
-                        
-                        if not moved:
-                            for bead in game_state.human_beads_position:
-                                neighbors = Empty_Neighbour(bead, game_state.ai_beads_position, game_state.human_beads_position)
-                                if neighbors:
-                                    game_state.human_beads_position.remove(bead)
-                                    game_state.human_beads_position.append(neighbors[0])
-                                    particle_system.emit(neighbors[0], COLOR_HUMAN, count=15)
-                                    move_history.append((bead, neighbors[0]))
+                        if not ai_search.busy:
+                            ai_search.submit('mcts_fast', 'move_for', list(game_state.ai_beads_position),
+                                             list(game_state.human_beads_position))
+                        done, search_result = ai_search.poll()
+                        if done:
+                            best_move = search_result
+                            
+                            moved = False
+                            if best_move and best_move[0] != best_move[1] and best_move[0] in game_state.human_beads_position:
+                                recent_move = (best_move[0], best_move[1])
+                                if recent_move not in move_history[-4:]:
+                                    game_state.human_beads_position.remove(best_move[0])
+                                    game_state.human_beads_position.append(best_move[1])
+                                    particle_system.emit(best_move[1], COLOR_HUMAN, count=15)
+                                    move_history.append(recent_move)
                                     moved = True
-                                    break
                         
-                        if not moved:
-                            ai_vs_ai_stuck_counter += 1
-                        else:
-                            ai_vs_ai_stuck_counter = 0
+                            if not moved:
+                                for bead in game_state.human_beads_position:
+                                    neighbors = Empty_Neighbour(bead, game_state.ai_beads_position, game_state.human_beads_position)
+                                    if neighbors:
+                                        game_state.human_beads_position.remove(bead)
+                                        game_state.human_beads_position.append(neighbors[0])
+                                        particle_system.emit(neighbors[0], COLOR_HUMAN, count=15)
+                                        move_history.append((bead, neighbors[0]))
+                                        moved = True
+                                        break
                         
-                        ai_move = True
-                        human_move = False
-                        last_ai_move_time = current_time
+                            if not moved:
+                                ai_vs_ai_stuck_counter += 1
+                            else:
+                                ai_vs_ai_stuck_counter = 0
+                        
+                            ai_move = True
+                            human_move = False
+                            last_ai_move_time = current_time
             else:
                 if ai_move == False and human_move == True:
-                    if ai_type == MINIMAX_AI:
-                        ara_ai_1 = copy.deepcopy(game_state.ai_beads_position)
-                        ara_human_1 = copy.deepcopy(game_state.human_beads_position)
-                        result1, i1, n1 = Mini_Max_Move(ara_ai_1, ara_human_1, 4, True)
-                        if n1 and i1:
-                            game_state.ai_beads_position.remove(n1)
-                            game_state.ai_beads_position.append(i1)
-                            particle_system.emit(i1, COLOR_AI, count=20)
-                    elif ai_type == ASTAR_FUZZY_AI:
-                        astar_fuzzy_ai_full.update_game_state(game_state.ai_beads_position, game_state.human_beads_position)
+                    if not ai_search.busy:
+                        if ai_type == MINIMAX_AI:
+                            ara_ai_1 = copy.deepcopy(game_state.ai_beads_position)
+                            ara_human_1 = copy.deepcopy(game_state.human_beads_position)
+                            ai_search.submit('minimax', 'get_best_move', ara_ai_1, ara_human_1, MINIMAX_MAX_DEPTH, True,
+                                             MINIMAX_TIME_LIMIT)
+                        elif ai_type == ASTAR_FUZZY_AI:
+                            ai_search.submit('mcts_full', 'move_for', list(game_state.ai_beads_position),
+                                             list(game_state.human_beads_position))
+                    done, search_result = ai_search.poll()
+                    if done:
+                        if ai_type == MINIMAX_AI:
+                            result1, i1, n1 = search_result
+                            if n1 and i1:
+                                game_state.ai_beads_position.remove(n1)
+                                game_state.ai_beads_position.append(i1)
+                                particle_system.emit(i1, COLOR_AI, count=20)
+                        elif ai_type == ASTAR_FUZZY_AI:
+                            best_move = search_result
                         
-                        best_move = astar_fuzzy_ai_full.get_best_move(game_state.ai_beads_position[0] if game_state.ai_beads_position else (0, 0))
+                            if best_move and best_move[0] != best_move[1] and best_move[0] in game_state.ai_beads_position:
+                                game_state.ai_beads_position.remove(best_move[0])
+                                game_state.ai_beads_position.append(best_move[1])
+                                particle_system.emit(best_move[1], COLOR_AI, count=20)
+                                last_move_effect = {'start': best_move[0], 'end': best_move[1], 'start_time': current_time, 'duration': 700}
+                            else:
+                                for bead in game_state.ai_beads_position:
+                                    neighbors = Empty_Neighbour(bead, game_state.ai_beads_position, game_state.human_beads_position)
+                                    if neighbors:
+                                        game_state.ai_beads_position.remove(bead)
+                                        game_state.ai_beads_position.append(neighbors[0])
+                                        particle_system.emit(neighbors[0], COLOR_AI, count=20)
+                                        last_move_effect = {'start': bead, 'end': neighbors[0], 'start_time': current_time, 'duration': 700}
+                                        break
                         
-                        if best_move and best_move[0] != best_move[1] and best_move[0] in game_state.ai_beads_position:
-                            game_state.ai_beads_position.remove(best_move[0])
-                            game_state.ai_beads_position.append(best_move[1])
-                            particle_system.emit(best_move[1], COLOR_AI, count=20)
-                            last_move_effect = {'start': best_move[0], 'end': best_move[1], 'start_time': current_time, 'duration': 700}
-                        else:
-                            for bead in game_state.ai_beads_position:
-                                neighbors = Empty_Neighbour(bead, game_state.ai_beads_position, game_state.human_beads_position)
-                                if neighbors:
-                                    game_state.ai_beads_position.remove(bead)
-                                    game_state.ai_beads_position.append(neighbors[0])
-                                    particle_system.emit(neighbors[0], COLOR_AI, count=20)
-                                    last_move_effect = {'start': bead, 'end': neighbors[0], 'start_time': current_time, 'duration': 700}
-                                    break
-                    
-                    ai_move = True
-                    human_move = False
+                        ai_move = True
+                        human_move = False
+        
+        profiler.lap('ai')
         
-        for event in pygame.event.get():
+        for event in frame_scheduler.events():
             if event.type == pygame.QUIT:
                 running = False
+            if event.type == pygame.VIDEOEXPOSE:
+                dirty_rects.invalidate()
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     if current_screen == GAME_PLAYING:
+                        ai_search.cancel()
                         current_screen = GAME_MODE_SELECTION
                         game_state.ai_beads_position = [top, top_l, top_r, top_t, left_l, right_r]
                         game_state.human_beads_position = [bottom, bottom_l, bottom_r, bottom_t, left_r, right_l]
@@ -1156,6 +1702,9 @@ def Game_Loop():
                         particle_system.emit((width // 2, height // 2), COLOR_PRIMARY, count=50, velocity_range=8)
                     else:
                         running = False
+                elif event.key == pygame.K_F3:
+                    profiler.toggle_overlay()
+                    dirty_rects.invalidate()
                 elif event.key == pygame.K_F11:
                     # Force fullscreen to desktop size
                     info = pygame.display.Info()
@@ -1163,6 +1712,7 @@ def Game_Loop():
                         screen = pygame.display.set_mode((info.current_w, info.current_h), pygame.FULLSCREEN | pygame.SCALED)
                     except pygame.error:
                         screen = pygame.display.set_mode((info.current_w, info.current_h), pygame.FULLSCREEN)
+                    Invalidate_Display_Caches()
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:
                     if current_screen == GAME_MODE_SELECTION:
@@ -1178,7 +1728,6 @@ def Game_Loop():
                             human_move = False
                             last_ai_move_time = pygame.time.get_ticks()
                             ai_vs_ai_stuck_counter = 0
-                            astar_fuzzy_ai.update_game_state(game_state.ai_beads_position, game_state.human_beads_position)
                             particle_system.emit(mouse_pos, COLOR_SECONDARY, count=30)
                     
                     elif current_screen == AI_TYPE_SELECTION:
@@ -1189,7 +1738,6 @@ def Game_Loop():
                         elif astar_fuzzy_btn.update(mouse_pos, True):
                             ai_type = ASTAR_FUZZY_AI
                             current_screen = GAME_PLAYING
-                            astar_fuzzy_ai_full.update_game_state(game_state.ai_beads_position, game_state.human_beads_position)
                             particle_system.emit(mouse_pos, COLOR_HUMAN, count=30)
                         elif back_btn.update(mouse_pos, True):
                             current_screen = GAME_MODE_SELECTION
@@ -1198,6 +1746,7 @@ def Game_Loop():
                     elif current_screen == GAME_PLAYING and not ai_vs_ai_simulation:
                         # In-game back button click
                         if in_game_back_btn.update(mouse_pos, True):
+                            ai_search.cancel()
                             # Return to previous page depending on mode
                             if game_mode == AI_VS_HUMAN:
                                 current_screen = AI_TYPE_SELECTION
@@ -1253,6 +1802,7 @@ def Game_Loop():
                                 particle_system.emit((x, y), COLOR_HUMAN, count=10)
                         # Restart button click during gameplay
                         if restart_btn.update(mouse_pos, True):
+                            ai_search.cancel()
                             game_state.ai_beads_position = [top, top_l, top_r, top_t, left_l, right_r]
                             game_state.human_beads_position = [bottom, bottom_l, bottom_r, bottom_t, left_r, right_l]
                             ai_move = True
@@ -1274,43 +1824,58 @@ def Game_Loop():
                             ai_vs_ai_simulation = False
                             particle_system.emit((width // 2, height // 2), COLOR_ACCENT, count=100, velocity_range=10)
         
+        profiler.lap('events')
+        
         # Update
         particle_system.update()
         floating_texts.update()
         diamond_anim.update()
+        profiler.lap('update')
         
         # Draw
-        ModernUI.draw_futuristic_background(screen, current_time)
+        # With dirty rects the background holds still: its colour shift
+        # would otherwise change every pixel and force full flips
+        if ModernUI.draw_futuristic_background(screen, 0 if dirty_rects.enabled else current_time):
+            dirty_rects.invalidate()
+        profiler.lap('background')
+        if current_screen != drawn_screen:
+            dirty_rects.invalidate()
+            drawn_screen = current_screen
         # Unified top UI offset (no persistent title bar)
         top_ui_y = 10
         
         if current_screen == GAME_MODE_SELECTION:
-            diamond_anim.draw(screen)
+            dirty_rects.add(diamond_anim.draw(screen))
             ModernUI.draw_glowing_text(screen, "DIAMOND CHASE", font, COLOR_PRIMARY,
                                       (width // 2, 240), glow_intensity=1)
+            profiler.lap('text')
             
             ai_vs_human_btn.update(mouse_pos, False)
             ai_vs_ai_btn.update(mouse_pos, False)
-            ai_vs_human_btn.draw(screen)
-            ai_vs_ai_btn.draw(screen)
+            dirty_rects.add(ai_vs_human_btn.draw(screen))
+            dirty_rects.add(ai_vs_ai_btn.draw(screen))
+            profiler.lap('panels')
         
         elif current_screen == AI_TYPE_SELECTION:
             ModernUI.draw_glowing_text(screen, "Select AI Type", font, COLOR_PRIMARY,
                                       (width // 2, 220), glow_intensity=1)
+            profiler.lap('text')
             
             minimax_btn.update(mouse_pos, False)
             astar_fuzzy_btn.update(mouse_pos, False)
-            minimax_btn.draw(screen)
-            astar_fuzzy_btn.draw(screen)
+            dirty_rects.add(minimax_btn.draw(screen))
+            dirty_rects.add(astar_fuzzy_btn.draw(screen))
             
             back_btn.update(mouse_pos, False)
-            back_btn.draw(screen)
+            dirty_rects.add(back_btn.draw(screen))
+            profiler.lap('panels')
         
         elif current_screen == GAME_PLAYING:
-            # Trap beads
+            # Trap beads, with the engine's capture rule so the AIs search the game being played
+            ai_lost, human_lost = captures(board_layout.to_mask(game_state.ai_beads_position),
+                                           board_layout.to_mask(game_state.human_beads_position))
             for item in game_state.ai_beads_position[:]:
-                x, y = Trap_Beads(item[0], item[1], neighbour, RED, game_state.ai_beads_position, game_state.human_beads_position)
-                if x == 0 and y != 0:
+                if ai_lost >> NODE_ID[item] & 1:
                     game_state.ai_beads_position.remove(item)
                     particle_system.emit(item, COLOR_AI, count=30, velocity_range=6)
                     particle_system.emit_confetti(item, COLOR_AI, count=28)
@@ -1318,8 +1883,7 @@ def Game_Loop():
                     floating_texts.spawn("+1", item, COLOR_HUMAN)
             
             for item in game_state.human_beads_position[:]:
-                x, y = Trap_Beads(item[0], item[1], neighbour, GREEN, game_state.ai_beads_position, game_state.human_beads_position)
-                if x == 0 and y > 0:
+                if human_lost >> NODE_ID[item] & 1:
                     game_state.human_beads_position.remove(item)
                     particle_system.emit(item, COLOR_HUMAN, count=30, velocity_range=6)
                     particle_system.emit_confetti(item, COLOR_HUMAN, count=28)
@@ -1328,6 +1892,7 @@ def Game_Loop():
             
             len_ai = len(game_state.ai_beads_position)
             len_human = len(game_state.human_beads_position)
+            profiler.lap('update')
             
             # Count-up animation and draw score panels
             target_ai = 6 - len_human
@@ -1338,40 +1903,46 @@ def Game_Loop():
             disp_player = int(round(ui_human_score))
             if ai_vs_ai_simulation:
                 # AI 1 (Minimax) controls AI beads, so its score is based on human pieces lost
-                draw_score_panel(screen, "AI 1 (Minimax)", disp_ai, (50, 50), COLOR_AI, current_time)
+                dirty_rects.add(draw_score_panel(screen, "AI 1 (Minimax)", disp_ai, (50, 50), COLOR_AI, current_time))
                 # AI 2 (MCTS) controls human beads, so its score is based on AI pieces lost
-                draw_score_panel(screen, "AI 2 (MCTS)", disp_player, (width - 330, 50), COLOR_HUMAN, current_time)
+                dirty_rects.add(draw_score_panel(screen, "AI 2 (MCTS)", disp_player, (width - 330, 50), COLOR_HUMAN,
+                                                 current_time))
             else:
                 # AI Score shows human pieces captured by AI
-                draw_score_panel(screen, "AI Score", disp_ai, (50, 50), COLOR_AI, current_time)
+                dirty_rects.add(draw_score_panel(screen, "AI Score", disp_ai, (50, 50), COLOR_AI, current_time))
                 # Player Score shows AI pieces captured by player
-                draw_score_panel(screen, "Player Score", disp_player, (width - 330, 50), COLOR_HUMAN, current_time)
+                dirty_rects.add(draw_score_panel(screen, "Player Score", disp_player, (width - 330, 50), COLOR_HUMAN,
+                                                 current_time))
 
             # In-game Back and Restart buttons only for human play (hide in AI vs AI)
             if not ai_vs_ai_simulation:
                 in_game_back_btn.update(mouse_pos, False)
-                in_game_back_btn.draw(screen)
+                dirty_rects.add(in_game_back_btn.draw(screen))
                 restart_btn.update(mouse_pos, False)
-                restart_btn.draw(screen)
+                dirty_rects.add(restart_btn.draw(screen))
+            profiler.lap('panels')
             
             if valid == True:
                 for item in ara:
-                    ModernUI.draw_glowing_circle(screen, COLOR_OPTION, item, 10, glow_layers=4)
-            
-            ModernUI.draw_glowing_line(screen, COLOR_PRIMARY, top, bottom, width=2)
-            ModernUI.draw_glowing_line(screen, COLOR_PRIMARY, right, left, width=2)
+                    dirty_rects.add(ModernUI.draw_glowing_circle(screen, COLOR_OPTION, item, 10, glow_layers=4))
+            profiler.lap('beads')
             
-            Draw_Polygon()
-            Draw_Circle(game_state.human_beads_position, GREEN)
-            Draw_Circle(game_state.ai_beads_position, RED)
+            Draw_Board(screen)
+            profiler.lap('board')
+            dirty_rects.add(Draw_Circle(game_state.human_beads_position, GREEN))
+            dirty_rects.add(Draw_Circle(game_state.ai_beads_position, RED))
             # (line glow effect removed per request)
+            profiler.lap('beads')
             
-            ModernUI.draw_glowing_text(screen, "Click a piece, then a highlighted node", text_font, WHITE,
-                                      (width // 2, 120), glow_intensity=1)
+            hint = "AI is thinking..." if ai_search.busy and not ai_vs_ai_simulation else "Click a piece, then a highlighted node"
+            dirty_rects.add(ModernUI.draw_glowing_text(screen, hint, text_font, WHITE,
+                                                       (width // 2, 120), glow_intensity=1))
+            profiler.lap('text')
             
             val = Check_Winner(game_state.ai_beads_position, game_state.human_beads_position)
             if val != -1:
                 winner = True
+                ai_search.cancel()
                 current_screen = GAME_OVER
                 particle_system.emit((width // 2, height // 2), 
                                    COLOR_HUMAN if val == 0 else COLOR_AI, count=100, velocity_range=10)
@@ -1392,17 +1963,31 @@ def Game_Loop():
                 else:
                     ModernUI.draw_glowing_text(screen, "YOU WIN!", text_font_won, COLOR_HUMAN,
                                               (width // 2, height // 2 - 100), glow_intensity=5)
+            profiler.lap('text')
             
             menu_btn.update(mouse_pos, False)
-            menu_btn.draw(screen)
+            dirty_rects.add(menu_btn.draw(screen))
+            profiler.lap('panels')
         
-        particle_system.draw(screen)
-        floating_texts.draw(screen)
+        dirty_rects.add(particle_system.draw(screen))
+        dirty_rects.add(floating_texts.draw(screen))
+        profiler.lap('particles')
+        dirty_rects.add(profiler.draw_overlay(screen))
+        profiler.lap('overlay')
         
-        pygame.display.flip()
-        clock.tick(60)
+        dirty_rects.present()
+        profiler.lap('present')
+        # Idle only while waiting on the human: no AI to run, nothing moving
+        ai_to_play = current_screen == GAME_PLAYING and (ai_vs_ai_simulation or human_move)
+        frame_scheduler.tick(clock, ai_to_play or ai_search.busy or len(particle_system) > 0
+                             or len(floating_texts.items) > 0 or profiler.overlay)
+        profiler.lap('wait')
+        profiler.end_frame()
     
+    ai_search.shutdown()
+    profiler.close()
     pygame.quit()
 
 
-Game_Loop()
\ No newline at end of file
+if __name__ == '__main__':
+    Game_Loop()
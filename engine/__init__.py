@@ -0,0 +1,46 @@
+"""
+Headless Diamond Chase engine: board rules, topology and both search engines.
+
+Nothing in this package imports pygame; nodes are identified by index
+(see ``board.NODE_NAMES``) and the front end maps them to pixels through
+``board.Layout``.
+"""
+
+from .board import (
+    FULL_MASK,
+    MIN_BEADS,
+    NEIGHBOUR_MASKS,
+    NEIGHBOURS,
+    NODE_INDEX,
+    NODE_NAMES,
+    NUM_NODES,
+    START_AI,
+    START_HUMAN,
+    WIN_SCORE,
+    ZOBRIST_SIDE,
+    Layout,
+    Position,
+    bits,
+    captures,
+    mask_of,
+    popcount,
+    zobrist_key,
+)
+from .mcts import MCTS, GameState, MCTSNode
+from .minimax import AlphaBeta, last_search_report, mini_max_move
+from .transposition import TranspositionTable
+
+# Classes from modules that are also command-line entry points; importing
+# them with the package would make ``python -m engine.<module>`` run the
+# module a second time, so they load on first use
+_LAZY = {'OpeningBook': 'book', 'Tablebase': 'tablebase'}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    import importlib
+    value = getattr(importlib.import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
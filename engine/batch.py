@@ -0,0 +1,272 @@
+"""
+Vectorized evaluation and random playouts over many positions at once.
+
+Positions are held as NumPy arrays of occupancy masks (one uint32 per
+position and side). The evaluation functions score a whole array in one
+call, counting mobility through the node adjacency matrix. random_playouts
+advances many games in lockstep: each ply every unfinished game plays a
+random legal move for its side to move (or, for a share of the games, the
+greedy move MCTS._simulate would pick), and captures are resolved with the
+same rules as Position.apply_move, AI side first.
+
+NumPy is optional. Without it ``available`` is False and MCTS keeps using
+its scalar playouts.
+"""
+
+from typing import Iterable, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+from .board import FULL_MASK, MIN_BEADS, NEIGHBOUR_MASKS, NEIGHBOURS, NUM_NODES, WIN_SCORE, Position
+from .board import trapped as _scalar_trapped
+
+available = np is not None
+
+if available:
+    _NODE_BITS = np.array([1 << n for n in range(NUM_NODES)], dtype=np.uint32)
+    # ADJACENCY[i, j] is 1 when nodes i and j are neighbours
+    ADJACENCY = np.zeros((NUM_NODES, NUM_NODES), dtype=np.int32)
+    for _node, _nbrs in enumerate(NEIGHBOURS):
+        ADJACENCY[_node, list(_nbrs)] = 1
+    # Float copy for the mobility product, which NumPy runs through BLAS for
+    # floats only; the counts stay far below float32's exact range
+    _ADJACENCY_FLOAT = ADJACENCY.astype(np.float32)
+    _NEIGHBOUR_MASKS = np.array(NEIGHBOUR_MASKS, dtype=np.uint32)
+    # Every directed edge (src, dst) is a potential move, in get_moves() order
+    _EDGES = [(src, dst) for src in range(NUM_NODES) for dst in sorted(NEIGHBOURS[src])]
+    _EDGE_INDEX = {edge: i for i, edge in enumerate(_EDGES)}
+    _EDGE_SRC = np.array([1 << src for src, _ in _EDGES], dtype=np.uint32)
+    _EDGE_DST = np.array([1 << dst for _, dst in _EDGES], dtype=np.uint32)
+    _EDGE_STEP = _EDGE_SRC | _EDGE_DST
+    # Beads that can become trapped by a move: the destination and its
+    # neighbours, as a mask and as a row of node slots padded with the
+    # empty node NUM_NODES (no bit, no neighbours)
+    _EDGE_CANDIDATES = np.array([NEIGHBOUR_MASKS[dst] | (1 << dst) for _, dst in _EDGES], dtype=np.uint32)
+    _SLOTS = 1 + max(len(nbrs) for nbrs in NEIGHBOURS)
+    _EDGE_SLOTS = np.full((len(_EDGES), _SLOTS), NUM_NODES, dtype=np.intp)
+    for _edge, (_, _dst) in enumerate(_EDGES):
+        _EDGE_SLOTS[_edge, :1 + len(NEIGHBOURS[_dst])] = [_dst, *NEIGHBOURS[_dst]]
+    _SLOT_BITS = np.append(_NODE_BITS, np.uint32(0))
+    _SLOT_NEIGHBOURS = np.append(_NEIGHBOUR_MASKS, np.uint32(0))
+    _FULL = np.uint32(FULL_MASK)
+    del _node, _nbrs, _edge, _dst
+    _POPCOUNT = None
+
+
+def popcount(masks):
+    """Set bits in each element of a uint32 array"""
+    global _POPCOUNT
+    if hasattr(np, 'bitwise_count'):  # NumPy >= 2.0
+        return np.bitwise_count(masks)
+    if _POPCOUNT is None:
+        table = np.zeros(1 << NUM_NODES, dtype=np.uint8)
+        for n in range(NUM_NODES):
+            table[1 << n:2 << n] = table[:1 << n] + 1
+        _POPCOUNT = table
+    return _POPCOUNT[masks]
+
+
+def from_positions(positions: Iterable[Position]) -> Tuple['np.ndarray', 'np.ndarray']:
+    """(ai, human) uint32 mask arrays for a sequence of positions"""
+    positions = list(positions)
+    return (np.fromiter((p.ai for p in positions), dtype=np.uint32, count=len(positions)),
+            np.fromiter((p.human for p in positions), dtype=np.uint32, count=len(positions)))
+
+
+def occupancy(masks, dtype=np.int32 if available else None):
+    """(n, NUM_NODES) 0/1 matrix of the nodes set in each mask"""
+    return ((masks[:, None] & _NODE_BITS) != 0).astype(dtype)
+
+
+def trapped(own, enemy, empty, candidates=_FULL if available else None):
+    """Vectorized board.trapped, limited to the candidate nodes of each game"""
+    nbrs = _NEIGHBOUR_MASKS[None, :]
+    own = own & candidates
+    hit = (own[:, None] & _NODE_BITS) != 0
+    hit &= (empty[:, None] & nbrs) == 0
+    hit &= (enemy[:, None] & nbrs) != 0
+    result = (hit * _NODE_BITS).sum(axis=1, dtype=np.uint32)
+    # Taking beads one at a time only differs when two trapped beads are
+    # neighbours (the first capture frees the second); redo those games
+    # with the scalar rule
+    touching = (hit & ((result[:, None] & nbrs) != 0)).any(axis=1)
+    for i in np.flatnonzero(touching).tolist():
+        result[i] = _scalar_trapped(int(own[i]), int(enemy[i]), int(empty[i]))
+    return result
+
+
+def mobility(own, empty):
+    """Vectorized board.mobility: (bead, empty neighbour) pairs per position"""
+    return _mobility(own, _empty_neighbours(empty))
+
+
+def _empty_neighbours(empty):
+    """Empty neighbours of every node, (n, NUM_NODES)"""
+    return occupancy(empty, np.float32) @ _ADJACENCY_FLOAT
+
+
+def _mobility(own, empty_neighbours):
+    # Empty neighbours summed over the nodes own occupies
+    return (occupancy(own, np.float32) * empty_neighbours).sum(axis=1).astype(np.int64)
+
+
+def _counts_and_mobility(ai, human):
+    ai = np.asarray(ai, dtype=np.uint32)
+    human = np.asarray(human, dtype=np.uint32)
+    empty_neighbours = _empty_neighbours(_FULL ^ (ai | human))
+    return (popcount(ai).astype(np.int64), popcount(human).astype(np.int64),
+            _mobility(ai, empty_neighbours), _mobility(human, empty_neighbours))
+
+
+def evaluate_heuristic(ai, human):
+    """Position.evaluate_heuristic() for each position (decided games score 1.0/0.0)"""
+    n_ai, n_human, ai_mobility, human_mobility = _counts_and_mobility(ai, human)
+    total = ai_mobility + human_mobility
+    mobility_score = np.divide(ai_mobility - human_mobility, total,
+                               out=np.zeros(len(total)), where=total > 0)
+    score = np.clip(0.5 + (n_ai - n_human) / 6.0 * 0.35 + mobility_score * 0.15, 0.0, 1.0)
+    score = np.where(n_ai < MIN_BEADS, 0.0, score)
+    return np.where(n_human < MIN_BEADS, 1.0, score)
+
+
+def minimax_score(ai, human):
+    """Position.minimax_score() for each position"""
+    n_ai, n_human, ai_mobility, human_mobility = _counts_and_mobility(ai, human)
+    score = ai_mobility - human_mobility + n_ai - n_human
+    score = np.where(n_ai < MIN_BEADS, -WIN_SCORE, score)
+    return np.where(n_human < MIN_BEADS, WIN_SCORE, score)
+
+
+def children(position: Position, is_ai: bool):
+    """
+    All moves for the side to move and the positions they lead to
+
+    Returns (moves, ai, human): the (from, to) moves in get_moves() order
+    and the resulting mask arrays, ready for evaluate_heuristic or
+    minimax_score.
+    """
+    moves = position.get_moves(is_ai)
+    edges = np.array([_EDGE_INDEX[move] for move in moves], dtype=np.intp)
+    ai = np.full(len(moves), position.ai, dtype=np.uint32)
+    human = np.full(len(moves), position.human, dtype=np.uint32)
+    return moves, *_play_edges(ai, human, np.full(len(moves), is_ai), edges)
+
+
+def _play_edges(ai, human, turn, edges):
+    """Play edge i in game i for the side turn[i], then resolve captures as board.captures does"""
+    step = _EDGE_STEP[edges]
+    ai = np.where(turn, ai ^ step, ai)
+    human = np.where(turn, human, human ^ step)
+    slots = _EDGE_SLOTS[edges]
+    bits = _SLOT_BITS[slots]
+    nbrs = _SLOT_NEIGHBOURS[slots]
+    empty = _FULL ^ (ai | human)
+    ai_lost = _trapped_slots(ai, human, empty, bits, nbrs, edges)
+    ai = ai & ~ai_lost
+    human_lost = _trapped_slots(human, ai, empty | ai_lost, bits, nbrs, edges)
+    return ai, human & ~human_lost
+
+
+def _trapped_slots(own, enemy, empty, bits, nbrs, edges):
+    """trapped() over the candidate node slots of each game's last move"""
+    hit = ((own[:, None] & bits) != 0) & ((empty[:, None] & nbrs) == 0) & ((enemy[:, None] & nbrs) != 0)
+    if not hit.any():  # most moves capture nothing
+        return np.zeros(len(own), dtype=np.uint32)
+    result = (hit * bits).sum(axis=1, dtype=np.uint32)
+    touching = (hit & ((result[:, None] & nbrs) != 0)).any(axis=1)
+    for i in np.flatnonzero(touching).tolist():
+        result[i] = _scalar_trapped(int(own[i] & _EDGE_CANDIDATES[edges[i]]), int(enemy[i]), int(empty[i]))
+    return result
+
+
+def _greedy_edges(ai, human, turn, legal, counts, candidates):
+    """
+    MCTS._greedy_move for each game: of its first candidates legal edges,
+    the one whose position evaluates best for the mover, the first of them
+    on ties
+    """
+    n = len(ai)
+    # Legal edges of all games back to back; game i's start where the
+    # counts of the games before it end
+    _, legal_edges = np.nonzero(legal)
+    first = np.cumsum(counts, dtype=np.intp) - counts
+    valid = np.arange(candidates) < counts[:, None]
+    edges = legal_edges[np.where(valid, first[:, None] + np.arange(candidates), first[:, None])]
+    child_ai, child_human = _play_edges(np.repeat(ai, candidates), np.repeat(human, candidates),
+                                        np.repeat(turn, candidates), edges.ravel())
+    scores = evaluate_heuristic(child_ai, child_human).reshape(n, candidates)
+    scores = np.where(turn[:, None], scores, 1.0 - scores)
+    scores[~valid] = -np.inf
+    return edges[np.arange(n), np.argmax(scores, axis=1)]
+
+
+def random_playouts(ai: Sequence[int], human: Sequence[int], ai_to_move, max_plies: int,
+                    rng: Optional['np.random.Generator'] = None, return_plies: bool = False,
+                    greedy: float = 0.0, greedy_candidates: int = 6):
+    """
+    Play one random game from each position, all in lockstep
+
+    ai, human and ai_to_move are per-game sequences (ai_to_move may also be a
+    single bool). Each ply a game plays a uniformly random legal move, or
+    with probability greedy the move MCTS._greedy_move picks: the best
+    evaluate_heuristic for the mover among its first greedy_candidates
+    legal moves in get_moves() order. Games stop when decided, without a
+    move or after max_plies; the returned float array holds the result from
+    the AI's perspective, as MCTS._simulate would: 1.0/0.0 for decided
+    games, else the heuristic. With return_plies the number of plies each
+    game lasted is returned too.
+    """
+    if not available:
+        raise RuntimeError('random_playouts needs NumPy')
+    if rng is None:
+        rng = np.random.default_rng()
+    ai = np.array(ai, dtype=np.uint32)
+    human = np.array(human, dtype=np.uint32)
+    turn = np.broadcast_to(np.asarray(ai_to_move, dtype=bool), ai.shape)
+    plies = np.zeros(ai.shape, dtype=np.int64)
+    # Unfinished games are packed into live (their indices) and a, h, t
+    live = np.flatnonzero((popcount(ai) >= MIN_BEADS) & (popcount(human) >= MIN_BEADS))
+    a, h, t = ai[live], human[live], turn[live]
+
+    for _ in range(max_plies):
+        if not len(live):
+            break
+        own = np.where(t, a, h)
+        empty = _FULL ^ (a | h)
+        legal = ((own[:, None] & _EDGE_SRC) != 0) & ((empty[:, None] & _EDGE_DST) != 0)
+        # ranks[i, e] counts the legal edges up to e, so the k-th legal edge
+        # is the first whose rank reaches k
+        ranks = np.cumsum(legal, axis=1, dtype=np.int8)
+        counts = ranks[:, -1]
+        stuck = counts == 0
+        if stuck.any():
+            ai[live[stuck]], human[live[stuck]] = a[stuck], h[stuck]
+            moving = ~stuck
+            live, a, h, t = live[moving], a[moving], h[moving], t[moving]
+            legal, ranks, counts = legal[moving], ranks[moving], counts[moving]
+            if not len(live):
+                break
+        k = (rng.random(len(live)) * counts).astype(np.int8) + 1
+        edges = np.argmax(ranks >= k[:, None], axis=1)
+        if greedy:
+            chosen = np.flatnonzero(rng.random(len(live)) < greedy)
+            if len(chosen):
+                edges[chosen] = _greedy_edges(a[chosen], h[chosen], t[chosen], legal[chosen],
+                                              counts[chosen], greedy_candidates)
+
+        a, h = _play_edges(a, h, t, edges)
+        t = ~t
+        plies[live] += 1
+        decided = (popcount(a) < MIN_BEADS) | (popcount(h) < MIN_BEADS)
+        if decided.any():
+            ai[live[decided]], human[live[decided]] = a[decided], h[decided]
+            going = ~decided
+            live, a, h, t = live[going], a[going], h[going], t[going]
+
+    ai[live], human[live] = a, h
+    if return_plies:
+        return evaluate_heuristic(ai, human), plies
+    return evaluate_heuristic(ai, human)
@@ -0,0 +1,193 @@
+"""
+Benchmark both search engines on a fixed corpus of positions.
+
+Every engine searches every corpus position from the same seed and budget
+and the results (chosen move, throughput, time to each depth, peak traced
+memory) are printed as JSON:
+
+    python -m engine.bench
+    python -m engine.bench --engines minimax --nodes 50000 --depth 8 --output bench.json
+
+Peak memory is measured in a second run under tracemalloc, so tracing does
+not distort the throughput figures.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from . import batch
+from .board import NODE_NAMES, Position, mask_of
+from .mcts import MCTS
+from .minimax import AlphaBeta
+
+# (name, AI beads, human beads, AI to move)
+CORPUS = (
+    ('opening', ('top', 'top_l', 'top_r', 'top_t', 'left_l', 'right_r'),
+     ('bottom', 'bottom_l', 'bottom_r', 'bottom_t', 'left_r', 'right_l'), True),
+    ('opening-reply', ('top', 'top_l', 'top_r', 'left_l', 'right_r', 'center_t_up'),
+     ('bottom', 'bottom_l', 'bottom_r', 'bottom_t', 'left_r', 'right_l'), False),
+    ('middlegame-6v6', ('top', 'top_r', 'top_t', 'left_l', 'right_r', 'center_l'),
+     ('left_r', 'right', 'bottom', 'bottom_r', 'bottom_l', 'center_t_down'), False),
+    ('middlegame-6v5', ('top', 'top_l', 'top_t', 'left_l', 'right_r', 'center'),
+     ('left', 'left_t', 'right_l', 'right_t', 'bottom_t'), True),
+    ('middlegame-5v5', ('top', 'top_r', 'left_l', 'right_l', 'center'),
+     ('left', 'left_r', 'right_r', 'bottom', 'bottom_t'), False),
+    # 4v4 endgames: AI wins in 7 plies, AI loses in 10, and a draw
+    ('endgame-4v4-win', ('top_l', 'bottom', 'center', 'center_r'), ('top_r', 'left', 'left_r', 'right_r'), True),
+    ('endgame-4v4-loss', ('top_r', 'left_t', 'right_r', 'right_l'),
+     ('top_l', 'right', 'bottom', 'center_t_down'), True),
+    ('endgame-4v4-draw', ('left_l', 'left_t', 'bottom_r', 'bottom_t'), ('top_r', 'top_l', 'bottom', 'center_r'), True),
+)
+
+ENGINES = ('minimax', 'mcts', 'mcts-batch')
+
+
+def corpus() -> List[Tuple[str, Position, bool]]:
+    return [(name, Position(mask_of(ai), mask_of(human)), ai_to_move) for name, ai, human, ai_to_move in CORPUS]
+
+
+def _move_json(move: Optional[Tuple[int, int]]) -> Optional[List[str]]:
+    return None if move is None else [NODE_NAMES[move[0]], NODE_NAMES[move[1]]]
+
+
+def bench_minimax(position: Position, ai_to_move: bool, node_limit: int, max_depth: int,
+                  table_mb: float = 16) -> Dict:
+    """Iterative deepening from a fresh table until the node budget or max_depth"""
+    searcher = AlphaBeta(table_mb=table_mb)
+    start = time.perf_counter()
+    score, move = searcher.iterative(position, ai_to_move, node_limit=node_limit, max_depth=max_depth)
+    elapsed = time.perf_counter() - start
+    stats = searcher.cutoff_stats()
+    return {
+        'move': _move_json(move),
+        'score': score,
+        'seconds': elapsed,
+        'nodes': searcher.nodes,
+        'nodes_per_sec': searcher.nodes / elapsed if elapsed else 0.0,
+        'depth': searcher.depth_reached,
+        'time_to_depth': {str(d): t for d, t in enumerate(searcher.depth_times, 1)},
+        'first_move_cutoff_rate': stats['first_move_cutoff_rate'],
+        'tt_hits': stats['tt_hits'],
+    }
+
+
+def bench_mcts(position: Position, ai_to_move: bool, time_limit: float, playout_batch: int = 0) -> Dict:
+    """One search from a fresh tree"""
+    mcts = MCTS(time_limit=time_limit, playout_batch=playout_batch)
+    start = time.perf_counter()
+    move = mcts.search(position, ai_to_move)
+    elapsed = time.perf_counter() - start
+    report = mcts.search_report()
+    return {
+        'move': _move_json(move),
+        'seconds': elapsed,
+        'iterations': mcts.iterations,
+        'playouts': mcts.playouts,
+        'playouts_per_sec': mcts.playouts / elapsed if elapsed else 0.0,
+        'tree_nodes': report.get('tree_nodes'),
+        'max_depth': report.get('max_depth'),
+        'phase_seconds': report.get('phase_seconds'),
+        'playout_lengths': {str(k): v for k, v in (report.get('playout_lengths') or {}).items()},
+    }
+
+
+def _peak_memory(fn: Callable[[], Dict]) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(engines=ENGINES, seed: int = 0, nodes: int = 100000, depth: int = 8, mcts_time: float = 1.0,
+        playout_batch: int = 256, memory: bool = True, log: Callable[[str], None] = lambda line: None) -> Dict:
+    """Benchmark engines on the corpus and return the report as a dict"""
+    runners = {
+        'minimax': lambda p, side: bench_minimax(p, side, nodes, depth),
+        'mcts': lambda p, side: bench_mcts(p, side, mcts_time),
+        'mcts-batch': lambda p, side: bench_mcts(p, side, mcts_time, playout_batch),
+    }
+    if 'mcts-batch' in engines and not batch.available:
+        log('skipping mcts-batch: NumPy is not installed')
+        engines = [e for e in engines if e != 'mcts-batch']
+
+    results = []
+    for engine in engines:
+        for name, position, ai_to_move in corpus():
+            log('%s on %s' % (engine, name))
+            random.seed(seed)
+            result = runners[engine](position, ai_to_move)
+            if memory:
+                random.seed(seed)
+                result['peak_memory_bytes'] = _peak_memory(lambda: runners[engine](position, ai_to_move))
+            result.update(engine=engine, position=name, ai_to_move=ai_to_move)
+            results.append(result)
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'numpy': batch.np.__version__ if batch.available else None,
+        },
+        'settings': {'seed': seed, 'nodes': nodes, 'depth': depth, 'mcts_time': mcts_time,
+                     'playout_batch': playout_batch},
+        'results': results,
+        'summary': {engine: _summary([r for r in results if r['engine'] == engine], depth) for engine in engines},
+    }
+
+
+def _summary(results: List[Dict], depth: int) -> Dict:
+    seconds = sum(r['seconds'] for r in results)
+    summary = {'positions': len(results), 'seconds': seconds}
+    if results and 'nodes' in results[0]:
+        summary['nodes_per_sec'] = sum(r['nodes'] for r in results) / seconds if seconds else 0.0
+        reached = [r['time_to_depth'][str(depth)] for r in results if str(depth) in r['time_to_depth']]
+        summary['reached_depth'] = len(reached)
+        summary['mean_time_to_depth'] = sum(reached) / len(reached) if reached else None
+    elif results:
+        summary['playouts_per_sec'] = sum(r['playouts'] for r in results) / seconds if seconds else 0.0
+    if results and 'peak_memory_bytes' in results[0]:
+        summary['peak_memory_bytes'] = max(r['peak_memory_bytes'] for r in results)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Diamond Chase engines on a fixed corpus')
+    parser.add_argument('--engines', default=','.join(ENGINES),
+                        help='comma-separated subset of %s (default: all)' % ', '.join(ENGINES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--nodes', type=int, default=100000, help='minimax node budget per position')
+    parser.add_argument('--depth', type=int, default=8, help='minimax maximum depth, and the N of time to depth N')
+    parser.add_argument('--mcts-time', type=float, default=1.0, help='MCTS seconds per position')
+    parser.add_argument('--playout-batch', type=int, default=256, help='playouts per iteration for mcts-batch')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc peak-memory runs')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    engines = [e.strip() for e in args.engines.split(',') if e.strip()]
+    unknown = sorted(set(engines) - set(ENGINES))
+    if unknown:
+        parser.error('unknown engine(s): %s' % ', '.join(unknown))
+
+    report = run(engines, args.seed, args.nodes, args.depth, args.mcts_time, args.playout_batch,
+                 memory=not args.no_memory, log=lambda line: print(line, file=sys.stderr))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,344 @@
+"""
+Bitboard representation of the Diamond Chase board.
+
+The 21 nodes are numbered in the order of ``NODE_NAMES`` and each side is
+stored as a 21-bit integer mask, so occupancy tests, move generation and
+trap detection are a handful of bitwise operations.
+"""
+
+import random
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+NODE_NAMES = (
+    'top', 'top_r', 'top_l', 'top_t',
+    'left', 'left_l', 'left_r', 'left_t',
+    'right', 'right_r', 'right_l', 'right_t',
+    'bottom', 'bottom_r', 'bottom_l', 'bottom_t',
+    'center', 'center_l', 'center_r', 'center_t_up', 'center_t_down',
+)
+
+# Same topology as Diamond_Dual.Get_First_Hop_Neighbour, by node name
+_ADJACENCY = {
+    'top': ('top_l', 'top_r', 'top_t'),
+    'top_r': ('top', 'top_t', 'left_l'),
+    'top_l': ('top', 'top_t', 'right_r'),
+    'top_t': ('top', 'top_l', 'top_r', 'center_t_up'),
+    'left': ('left_l', 'left_r', 'left_t'),
+    'left_l': ('left', 'left_t', 'top_r'),
+    'left_r': ('left', 'left_t', 'bottom_l'),
+    'left_t': ('left', 'left_l', 'left_r', 'center_l'),
+    'right': ('right_r', 'right_l', 'right_t'),
+    'right_r': ('right', 'right_t', 'top_l'),
+    'right_l': ('right', 'right_t', 'bottom_r'),
+    'right_t': ('right_r', 'right_l', 'right', 'center_r'),
+    'bottom': ('bottom_l', 'bottom_r', 'bottom_t'),
+    'bottom_r': ('bottom', 'bottom_t', 'right_l'),
+    'bottom_l': ('bottom', 'bottom_t', 'left_r'),
+    'bottom_t': ('bottom', 'bottom_l', 'bottom_r', 'center_t_down'),
+    'center': ('center_l', 'center_r', 'center_t_up', 'center_t_down'),
+    'center_l': ('center', 'center_t_up', 'center_t_down', 'left_t'),
+    'center_r': ('center', 'center_t_down', 'center_t_up', 'right_t'),
+    'center_t_up': ('center', 'center_l', 'center_r', 'top_t'),
+    'center_t_down': ('center', 'center_l', 'center_r', 'bottom_t'),
+}
+
+NUM_NODES = len(NODE_NAMES)
+FULL_MASK = (1 << NUM_NODES) - 1
+NODE_INDEX = {name: i for i, name in enumerate(NODE_NAMES)}
+NEIGHBOURS = tuple(tuple(NODE_INDEX[n] for n in _ADJACENCY[name]) for name in NODE_NAMES)
+NEIGHBOUR_MASKS = tuple(sum(1 << n for n in nbrs) for nbrs in NEIGHBOURS)
+
+# A side with fewer beads than this has lost
+MIN_BEADS = 4
+# Minimax score of a decided position
+WIN_SCORE = 1000
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(mask: int) -> int:
+        return bin(mask).count('1')
+
+
+# Set-bit index tuples for each half of a mask, so bits() is two lookups
+_LOW_BITS = 11
+_LOW_MASK = (1 << _LOW_BITS) - 1
+_BITS_LOW = tuple(tuple(i for i in range(_LOW_BITS) if m >> i & 1) for m in range(1 << _LOW_BITS))
+_BITS_HIGH = tuple(tuple(i for i in range(_LOW_BITS, NUM_NODES) if m << _LOW_BITS >> i & 1)
+                   for m in range(1 << (NUM_NODES - _LOW_BITS)))
+
+
+def bits(mask: int) -> Tuple[int, ...]:
+    """The node indices set in mask, lowest first"""
+    return _BITS_LOW[mask & _LOW_MASK] + _BITS_HIGH[mask >> _LOW_BITS]
+
+
+def mask_of(nodes: Iterable) -> int:
+    """Build a mask from node indices or node names"""
+    mask = 0
+    for node in nodes:
+        mask |= 1 << (NODE_INDEX[node] if isinstance(node, str) else node)
+    return mask
+
+
+# Zobrist keys, fixed-seeded so hashes agree across processes and runs
+_zobrist_rng = random.Random(0x5EED_D1A)
+ZOBRIST_AI = tuple(_zobrist_rng.getrandbits(64) for _ in range(NUM_NODES))
+ZOBRIST_HUMAN = tuple(_zobrist_rng.getrandbits(64) for _ in range(NUM_NODES))
+# XOR-ed in when the human side is to move
+ZOBRIST_SIDE = _zobrist_rng.getrandbits(64)
+del _zobrist_rng
+
+
+def zobrist_key(ai: int, human: int) -> int:
+    """Zobrist hash of a bead layout (AI to move)"""
+    key = 0
+    for b in bits(ai):
+        key ^= ZOBRIST_AI[b]
+    for b in bits(human):
+        key ^= ZOBRIST_HUMAN[b]
+    return key
+
+
+START_AI = mask_of(('top', 'top_l', 'top_r', 'top_t', 'left_l', 'right_r'))
+START_HUMAN = mask_of(('bottom', 'bottom_l', 'bottom_r', 'bottom_t', 'left_r', 'right_l'))
+
+
+def mobility(own: int, empty: int) -> int:
+    """Number of (bead, empty neighbour) pairs for the beads in own"""
+    return sum(popcount(NEIGHBOUR_MASKS[b] & empty) for b in bits(own))
+
+
+def trapped(own: int, enemy: int, empty: int) -> int:
+    """
+    Beads of own that are captured, taken one at a time in node order
+
+    A bead is captured when it has no empty neighbour and at least one enemy
+    neighbour. Each capture frees its node before the next bead is checked,
+    so of two trapped beads side by side only the first is taken.
+    """
+    result = 0
+    for b in bits(own):
+        nbrs = NEIGHBOUR_MASKS[b]
+        if not nbrs & empty and nbrs & enemy:
+            result |= 1 << b
+            empty |= 1 << b
+    return result
+
+
+def captures(ai: int, human: int, candidates: int = FULL_MASK) -> Tuple[int, int]:
+    """
+    (AI beads, human beads) captured in a bead layout, AI side first
+
+    This is the one capture rule: Position.apply_move, the tablebase and
+    the game loop all go through it. Only beads in candidates are checked.
+    """
+    empty = FULL_MASK & ~(ai | human)
+    ai_lost = trapped(ai & candidates, human, empty)
+    return ai_lost, trapped(human & candidates, ai & ~ai_lost, empty | ai_lost)
+
+
+class Position:
+    """
+    Bead layout with one occupancy mask per side
+
+    The Zobrist key and each side's mobility (number of bead/empty-neighbour
+    pairs) are kept up to date incrementally by apply_move, and make_move /
+    unmake_move let searches walk a single position up and down a line
+    instead of cloning it.
+    """
+
+    __slots__ = ('ai', 'human', 'key', 'ai_mobility', 'human_mobility', '_undo')
+
+    def __init__(self, ai: int = START_AI, human: int = START_HUMAN, key: Optional[int] = None):
+        self.ai = ai
+        self.human = human
+        self.key = zobrist_key(ai, human) if key is None else key
+        empty = self.empty
+        self.ai_mobility = mobility(ai, empty)
+        self.human_mobility = mobility(human, empty)
+        self._undo = None
+
+    def clone(self) -> 'Position':
+        other = Position.__new__(Position)
+        other.ai = self.ai
+        other.human = self.human
+        other.key = self.key
+        other.ai_mobility = self.ai_mobility
+        other.human_mobility = self.human_mobility
+        other._undo = None
+        return other
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Position) and self.ai == other.ai and self.human == other.human
+
+    def __hash__(self) -> int:
+        return self.key
+
+    def __getstate__(self):
+        return self.ai, self.human
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def hash_for(self, is_ai_turn: bool) -> int:
+        """Zobrist key including the side to move"""
+        return self.key if is_ai_turn else self.key ^ ZOBRIST_SIDE
+
+    def __repr__(self) -> str:
+        return 'Position(ai=%#x, human=%#x)' % (self.ai, self.human)
+
+    @property
+    def empty(self) -> int:
+        return FULL_MASK & ~(self.ai | self.human)
+
+    def get_moves(self, is_ai: bool) -> List[Tuple[int, int]]:
+        """Get all legal (from, to) moves for player"""
+        empty = self.empty
+        moves = []
+        for bead in bits(self.ai if is_ai else self.human):
+            for target in bits(NEIGHBOUR_MASKS[bead] & empty):
+                moves.append((bead, target))
+        return moves
+
+    def apply_move(self, move: Tuple[int, int], is_ai: bool):
+        """Apply move in place and remove trapped beads"""
+        src, dst = move
+        self._vacate(src, is_ai)
+        self._occupy(dst, is_ai)
+        self._remove_trapped(NEIGHBOUR_MASKS[dst] | (1 << dst))
+
+    def make_move(self, move: Tuple[int, int], is_ai: bool):
+        """Apply move in place, remembering how to undo it"""
+        if self._undo is None:
+            self._undo = []
+        self._undo.append((self.ai, self.human, self.key, self.ai_mobility, self.human_mobility))
+        self.apply_move(move, is_ai)
+
+    def unmake_move(self):
+        """Undo the most recent make_move"""
+        self.ai, self.human, self.key, self.ai_mobility, self.human_mobility = self._undo.pop()
+
+    def _vacate(self, node: int, is_ai: bool):
+        nbrs = NEIGHBOUR_MASKS[node]
+        # Beads around the node gain an empty neighbour, the bead leaving loses its own
+        self.ai_mobility += popcount(nbrs & self.ai)
+        self.human_mobility += popcount(nbrs & self.human)
+        lost = popcount(nbrs & self.empty)
+        if is_ai:
+            self.ai ^= 1 << node
+            self.ai_mobility -= lost
+            self.key ^= ZOBRIST_AI[node]
+        else:
+            self.human ^= 1 << node
+            self.human_mobility -= lost
+            self.key ^= ZOBRIST_HUMAN[node]
+
+    def _occupy(self, node: int, is_ai: bool):
+        nbrs = NEIGHBOUR_MASKS[node]
+        # Beads around the node lose an empty neighbour, the bead arriving gains its own
+        self.ai_mobility -= popcount(nbrs & self.ai)
+        self.human_mobility -= popcount(nbrs & self.human)
+        gained = popcount(nbrs & self.empty)
+        if is_ai:
+            self.ai |= 1 << node
+            self.ai_mobility += gained
+            self.key ^= ZOBRIST_AI[node]
+        else:
+            self.human |= 1 << node
+            self.human_mobility += gained
+            self.key ^= ZOBRIST_HUMAN[node]
+
+    def capture_mask(self, move: Tuple[int, int], is_ai: bool) -> int:
+        """Enemy beads the move would trap, without applying it"""
+        src, dst = move
+        own, enemy = (self.ai, self.human) if is_ai else (self.human, self.ai)
+        own ^= (1 << src) | (1 << dst)
+        empty = FULL_MASK & ~(own | enemy)
+        return trapped(enemy & NEIGHBOUR_MASKS[dst], own, empty)
+
+    def _remove_trapped(self, candidates: int = FULL_MASK):
+        """
+        Remove the beads captures() takes
+
+        After a move only beads in or next to the destination node can have
+        become trapped, so apply_move limits the scan to those candidates.
+        """
+        ai_lost, human_lost = captures(self.ai, self.human, candidates)
+        for b in bits(ai_lost):
+            self._vacate(b, True)
+        for b in bits(human_lost):
+            self._vacate(b, False)
+
+    def bead_counts(self) -> Tuple[int, int]:
+        return popcount(self.ai), popcount(self.human)
+
+    def is_terminal(self) -> bool:
+        return popcount(self.ai) < MIN_BEADS or popcount(self.human) < MIN_BEADS
+
+    def get_result(self, is_ai_perspective: bool) -> float:
+        """Get game result from perspective (1.0 = win, 0.0 = loss, 0.5 = draw)"""
+        if popcount(self.human) < MIN_BEADS:
+            return 1.0 if is_ai_perspective else 0.0
+        elif popcount(self.ai) < MIN_BEADS:
+            return 0.0 if is_ai_perspective else 1.0
+        return 0.5
+
+    def evaluate_heuristic(self) -> float:
+        """Quick position evaluation for AI (0.0 to 1.0)"""
+        if self.is_terminal():
+            return self.get_result(True)
+
+        n_ai, n_human = self.bead_counts()
+        material = (n_ai - n_human) / 6.0
+
+        ai_mobility = self.ai_mobility
+        human_mobility = self.human_mobility
+        total = ai_mobility + human_mobility
+        mobility_score = (ai_mobility - human_mobility) / total if total > 0 else 0.0
+
+        score = 0.5 + material * 0.35 + mobility_score * 0.15
+        return max(0.0, min(1.0, score))
+
+    def minimax_score(self) -> int:
+        """Leaf score used by minimax: mobility difference plus material difference"""
+        n_ai, n_human = self.bead_counts()
+        if n_human < MIN_BEADS:
+            return WIN_SCORE
+        if n_ai < MIN_BEADS:
+            return -WIN_SCORE
+        return self.ai_mobility - self.human_mobility + n_ai - n_human
+
+
+class Layout:
+    """Maps node indices to the screen coordinates the front end draws them at"""
+
+    def __init__(self, coords: Sequence[Tuple]):
+        if len(coords) != NUM_NODES:
+            raise ValueError('expected %d node coordinates, got %d' % (NUM_NODES, len(coords)))
+        self.coords = tuple(coords)
+        self.index = {pos: i for i, pos in enumerate(self.coords)}
+
+    @classmethod
+    def from_neighbour(cls, neighbour: Dict) -> 'Layout':
+        """Build a layout from a Get_First_Hop_Neighbour style dict (keys in NODE_NAMES order)"""
+        layout = cls(list(neighbour))
+        for i, pos in enumerate(layout.coords):
+            if {layout.index[n] for n in neighbour[pos]} != set(NEIGHBOURS[i]):
+                raise ValueError('neighbour table does not match board topology at %s' % NODE_NAMES[i])
+        return layout
+
+    def to_mask(self, beads: Iterable[Tuple]) -> int:
+        mask = 0
+        for pos in beads:
+            mask |= 1 << self.index[pos]
+        return mask
+
+    def to_coords(self, mask: int) -> List[Tuple]:
+        return [self.coords[i] for i in bits(mask)]
+
+    def position(self, ai_beads: Iterable[Tuple], human_beads: Iterable[Tuple]) -> Position:
+        return Position(self.to_mask(ai_beads), self.to_mask(human_beads))
+
+    def move_to_coords(self, move: Tuple[int, int]) -> Tuple[Tuple, Tuple]:
+        return self.coords[move[0]], self.coords[move[1]]
@@ -0,0 +1,151 @@
+"""
+Opening book for the fixed starting position.
+
+Every game starts from START_AI/START_HUMAN with the AI to move, so the
+first moves are the same game after game. The builder searches the opening
+tree offline and stores one best move per position, keyed by the Zobrist
+hash including the side to move (Position.hash_for). For each side it
+follows only the book move at that side's own turns and every reply at the
+opponent's, so whichever side an engine plays, it stays in book against
+any opponent for the first plies.
+
+The file is a header followed by fixed-size entries sorted by key:
+
+    key (uint64), from node, to node, score (int16, minimax_score scale)
+
+Build from the command line, e.g. 6 plies at 100000 nodes per position:
+
+    python -m engine.book build opening.book --plies 6 --nodes 100000
+"""
+
+import argparse
+import struct
+import sys
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from .board import NODE_NAMES, Position
+from .minimax import MAX_DEPTH, AlphaBeta
+
+MAGIC = b'DCOB'
+VERSION = 2
+
+_HEADER = struct.Struct('<4sHHI')  # magic, version, plies, entry count
+_ENTRY = struct.Struct('<QBBh')  # key, from, to, score
+
+
+class OpeningBook:
+    """Book moves loaded from a file into a dict"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, self.plies, count = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('%s is not a version %d Diamond Chase opening book' % (path, VERSION))
+        self._moves: Dict[int, Tuple[Tuple[int, int], int]] = {}
+        for key, src, dst, score in _ENTRY.iter_unpack(data[_HEADER.size:_HEADER.size + count * _ENTRY.size]):
+            self._moves[key] = ((src, dst), score)
+        self.hits = 0
+
+    @classmethod
+    def open_if_exists(cls, path: str) -> Optional['OpeningBook']:
+        try:
+            return cls(path)
+        except FileNotFoundError:
+            return None
+
+    def __len__(self) -> int:
+        return len(self._moves)
+
+    def probe(self, position: Position, is_ai_turn: bool) -> Optional[Tuple[Tuple[int, int], int]]:
+        """(move, score) for the side to move, or None when out of book"""
+        entry = self._moves.get(position.hash_for(is_ai_turn))
+        # Guard against hash collisions with positions the book never saw
+        if entry is None or entry[0] not in position.get_moves(is_ai_turn):
+            return None
+        self.hits += 1
+        return entry
+
+    def __getstate__(self):
+        return self.path
+
+    def __setstate__(self, path):
+        self.__init__(path)
+
+
+def build(path: str, plies: int = 6, node_limit: int = 100000, max_depth: int = MAX_DEPTH,
+          log: Callable[[str], None] = print):
+    """Search every book position in the first plies and write the book to path"""
+    searcher = AlphaBeta()
+    moves: Dict[int, Tuple[Tuple[int, int], int]] = {}
+    start = time.perf_counter()
+
+    def book_move(position: Position, is_ai_turn: bool) -> Tuple[int, int]:
+        key = position.hash_for(is_ai_turn)
+        entry = moves.get(key)
+        if entry is None:
+            score, move = searcher.iterative(position, is_ai_turn, node_limit=node_limit, max_depth=max_depth)
+            entry = moves[key] = (move, int(score))
+            if len(moves) % 25 == 0:
+                log('%d positions, %.0fs' % (len(moves), time.perf_counter() - start))
+        return entry[0]
+
+    for side in (True, False):
+        # Shallowest ply each position was reached at while building this side's tree
+        seen: Dict[int, int] = {}
+        stack = [(Position(), True, 0)]
+        while stack:
+            position, is_ai_turn, ply = stack.pop()
+            key = position.hash_for(is_ai_turn)
+            if ply >= plies or position.is_terminal() or seen.get(key, plies) <= ply:
+                continue
+            seen[key] = ply
+            legal = position.get_moves(is_ai_turn)
+            if not legal:
+                continue
+            for move in ([book_move(position, is_ai_turn)] if is_ai_turn == side else legal):
+                child = position.clone()
+                child.apply_move(move, is_ai_turn)
+                stack.append((child, not is_ai_turn, ply + 1))
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, plies, len(moves)))
+        for key in sorted(moves):
+            (src, dst), score = moves[key]
+            f.write(_ENTRY.pack(key, src, dst, score))
+    log('wrote %d positions to %s in %.0fs' % (len(moves), path, time.perf_counter() - start))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Diamond Chase opening book')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build_cmd = sub.add_parser('build', help='generate an opening book file')
+    build_cmd.add_argument('path')
+    build_cmd.add_argument('--plies', type=int, default=6, help='plies from the start to cover (default %(default)s)')
+    build_cmd.add_argument('--nodes', type=int, default=100000,
+                           help='minimax node budget per position (default %(default)s)')
+    build_cmd.add_argument('--depth', type=int, default=MAX_DEPTH, help='maximum search depth per position')
+    probe_cmd = sub.add_parser('probe', help='look up the starting position or given masks')
+    probe_cmd.add_argument('path')
+    probe_cmd.add_argument('ai', type=lambda s: int(s, 0), nargs='?')
+    probe_cmd.add_argument('human', type=lambda s: int(s, 0), nargs='?')
+    probe_cmd.add_argument('--human-to-move', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        build(args.path, args.plies, args.nodes, args.depth)
+    else:
+        position = Position() if args.ai is None else Position(args.ai, args.human)
+        entry = OpeningBook(args.path).probe(position, not args.human_to_move)
+        if entry is None:
+            print('not in book')
+        else:
+            (src, dst), score = entry
+            print('%s -> %s (score %d)' % (NODE_NAMES[src], NODE_NAMES[dst], score))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
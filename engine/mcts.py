@@ -0,0 +1,582 @@
+"""
+Monte Carlo Tree Search over bitboard positions.
+"""
+
+import math
+import random
+import time
+from typing import Dict, List, Tuple, Optional
+
+from .board import Position
+
+# MCTS states are bitboard positions; moves are (from, to) node indices
+GameState = Position
+
+# Seconds between calls to a search's progress callback
+PROGRESS_INTERVAL = 0.1
+# Seconds between checks of the stop event while worker processes search
+STOP_POLL_INTERVAL = 0.02
+PHASES = ('selection', 'expansion', 'simulation', 'backpropagation')
+# Playout policy: this share of moves is the greedy pick among the first
+# GREEDY_CANDIDATES moves, the rest uniformly random
+GREEDY_PLAYOUT_SHARE = 0.3
+GREEDY_CANDIDATES = 6
+# Share of the time limit one batch of vectorized playouts aims to take, so
+# the tree keeps growing between batches (at least twice the quickest batch,
+# as a batch costs about the same however few games it plays)
+BATCH_TIME_SHARE = 0.05
+
+
+class MCTSNode:
+    """Node in Monte Carlo Search Tree (the state is only read here, not stored)"""
+    
+    def __init__(self, state: GameState, parent: Optional['MCTSNode'] = None, 
+                 move: Optional[Tuple] = None, is_ai_turn: bool = True):
+        self.parent = parent
+        self.move = move  # Move that led to this state
+        self.is_ai_turn = is_ai_turn
+        
+        self.children = []
+        self.terminal = state.is_terminal()
+        self.untried_moves = [] if self.terminal else state.get_moves(is_ai_turn)
+        
+        self.visits = 0
+        self.wins = 0.0  # From AI perspective
+    
+    def is_fully_expanded(self) -> bool:
+        return len(self.untried_moves) == 0
+    
+    def is_terminal(self) -> bool:
+        return self.terminal
+    
+    def select_child(self, exploration: float = 1.414) -> 'MCTSNode':
+        """Select best child using UCB1 formula"""
+        best_value = -float('inf')
+        best_child = None
+        
+        for child in self.children:
+            if child.visits == 0:
+                ucb_value = float('inf')
+            else:
+                # UCB1: exploitation + exploration, from the point of view of the side choosing
+                exploitation = child.wins / child.visits
+                if not self.is_ai_turn:
+                    exploitation = 1.0 - exploitation
+                exploration_term = exploration * math.sqrt(math.log(self.visits) / child.visits)
+                ucb_value = exploitation + exploration_term
+            
+            if ucb_value > best_value:
+                best_value = ucb_value
+                best_child = child
+        
+        return best_child
+    
+    def expand(self, state: GameState) -> 'MCTSNode':
+        """Expand a random untried move, making it on state (this node's position)"""
+        move = self.untried_moves.pop(random.randrange(len(self.untried_moves)))
+        
+        state.make_move(move, self.is_ai_turn)
+        
+        # Create child node with opposite turn
+        child = MCTSNode(state, parent=self, move=move, is_ai_turn=not self.is_ai_turn)
+        self.children.append(child)
+        
+        return child
+    
+    def update(self, result: float, visits: int = 1):
+        """Update node statistics (result is the sum over visits playouts)"""
+        self.visits += visits
+        self.wins += result
+    
+    def best_child_by_visits(self) -> Optional['MCTSNode']:
+        """Return most visited child (most robust choice)"""
+        if not self.children:
+            return None
+        return max(self.children, key=lambda c: c.visits)
+
+
+class MCTS:
+    """
+    Monte Carlo Tree Search Algorithm
+    
+    With workers > 1 the search is root-parallel: each worker process grows
+    its own tree from the same root with a different seed and the root
+    children's visits and wins are summed to pick the move. The process pool
+    is created on first use and kept warm across moves until close(); on
+    platforms that spawn rather than fork, the main module must be safe to
+    import.
+    
+    With reuse_tree (single process only) the subtree under the move played
+    is kept, and the next search starts from its child for the opponent's
+    reply when that reply was already expanded, keeping its visits.
+    
+    With a tablebase, leaves it covers take its exact result instead of a
+    random playout. With an opening book, positions found in it are answered
+    with the book move without searching.
+    
+    With playout_batch > 0 (and NumPy installed) each iteration selects up
+    to batch_leaves leaves, steering later selections away from earlier
+    ones with a virtual loss, and plays up to playout_batch playouts, with
+    the same random/greedy mix, split between them in one vectorized call
+    (engine.batch). The batch size doubles while iterations finish within
+    BATCH_TIME_SHARE of the time limit and halves when they take longer,
+    and is cut to what fits in the time left, taking an iteration to cost
+    the quickest one so far plus the last one's time per extra playout.
+    """
+    
+    def __init__(self, time_limit: float = 1.0, exploration_constant: float = 1.414, workers: int = 1,
+                 reuse_tree: bool = False, tablebase=None, playout_batch: int = 0, book=None):
+        self.time_limit = time_limit
+        self.exploration_constant = exploration_constant
+        self.max_simulation_depth = 80
+        self.workers = max(1, workers)
+        self.reuse_tree = reuse_tree
+        self.tablebase = tablebase
+        self.book = book
+        if playout_batch:
+            # NumPy is only imported once batched playouts are asked for
+            from . import batch
+            if not batch.available:
+                playout_batch = 0
+        self.playout_batch = playout_batch
+        self.batch_leaves = 64
+        self._rng = None
+        self.reused_visits = 0  # visits carried into the last search
+        self.iterations = 0  # tree iterations of the last search
+        self.playouts = 0  # playouts (or exact leaf results) of the last search
+        self._pool = None
+        self._kept = None  # (node after our last move, its position)
+        self._report = None
+        self._start = 0.0
+        self._phase_times = [0.0] * len(PHASES)
+        self._playout_lengths: Dict[int, int] = {}
+    
+    def search(self, root_state: GameState, is_ai_turn: bool = True, stop=None,
+               progress=None) -> Optional[Tuple[int, int]]:
+        """
+        Run MCTS for the side to move and return best move
+        
+        stop is an optional threading.Event that ends the search early;
+        with workers > 1 it terminates the pool, discarding the workers'
+        statistics (the caller is expected to drop a cancelled result).
+        progress, if given, is called about every PROGRESS_INTERVAL seconds
+        with a partial search report (see search_report); with workers > 1
+        the statistics only arrive when the workers finish, so these reports
+        carry the elapsed seconds and no iterations or children.
+        
+        Four phases:
+        1. Selection: Navigate tree using UCB1
+        2. Expansion: Add new node to tree
+        3. Simulation: Play random game to end
+        4. Backpropagation: Update statistics
+        """
+        self._start = time.perf_counter()
+        self._phase_times = [0.0] * len(PHASES)
+        self._playout_lengths = {}
+        root = self._reusable_root(root_state, is_ai_turn)
+        self.reused_visits = root.visits if root is not None else 0
+        self.iterations = 0
+        self.playouts = 0
+        
+        entry = self.book.probe(root_state, is_ai_turn) if self.book is not None else None
+        if entry is not None:
+            self._report = self._build_report(None, is_ai_turn, {}, entry[0], book=True)
+            return entry[0]
+        
+        # Quick check for immediate winning move
+        move = self._winning_move(root_state, is_ai_turn)
+        if move is not None:
+            self._report = self._build_report(None, is_ai_turn, {}, move)
+            return move
+        
+        if self.workers > 1:
+            stats = self._parallel_root_statistics(root_state, is_ai_turn, stop, progress)
+            self.iterations = self.playouts = sum(visits for visits, _ in stats.values())
+            root = None
+        else:
+            root = self._grow_tree(root_state, is_ai_turn, root, stop, progress)
+            stats = {child.move: (child.visits, child.wins) for child in root.children}
+        
+        # Select best move based on visit count (most robust)
+        if stats:
+            move = max(stats, key=lambda m: stats[m][0])
+        else:
+            # Fallback to first available move
+            moves = root_state.get_moves(is_ai_turn)
+            move = moves[0] if moves else None
+        
+        self._report = self._build_report(root, is_ai_turn, stats, move)
+        if self.reuse_tree and root is not None and root.children:
+            self._keep(root_state, root.best_child_by_visits())
+        return move
+    
+    def search_report(self) -> Optional[dict]:
+        """
+        Statistics of the last search, or None before the first one
+        
+        Keys: move, seconds, iterations, playouts, reused_visits, children
+        (per root move: visits and value, the mean result for the side to
+        move), tree_nodes and max_depth (depth of the deepest node below
+        the root), phase_seconds (time in each of PHASES),
+        playout_lengths ({plies: count}; 0 for leaves that were decided or
+        found in the tablebase) and book (True when the move came from the
+        opening book). The tree and phase fields are None for root-parallel
+        searches.
+        """
+        return self._report
+    
+    def _build_report(self, root: Optional[MCTSNode], is_ai_turn: bool, stats: Dict, move,
+                      full: bool = True, book: bool = False) -> dict:
+        children = []
+        for child_move, (visits, wins) in sorted(stats.items(), key=lambda item: -item[1][0]):
+            value = wins / visits if visits else 0.0
+            children.append({'move': child_move, 'visits': visits, 'value': value if is_ai_turn else 1.0 - value})
+        report = {
+            'move': move,
+            'seconds': time.perf_counter() - self._start,
+            'iterations': self.iterations,
+            'playouts': self.playouts,
+            'reused_visits': self.reused_visits,
+            'children': children,
+            'book': book,
+        }
+        if not full:
+            return report
+        tree_nodes = max_depth = None
+        if root is not None:
+            tree_nodes, max_depth = 0, 0
+            stack = [(root, 0)]
+            while stack:
+                node, depth = stack.pop()
+                tree_nodes += 1
+                max_depth = max(max_depth, depth)
+                stack.extend((child, depth + 1) for child in node.children)
+        local = root is not None or self.workers == 1
+        report.update(
+            tree_nodes=tree_nodes,
+            max_depth=max_depth,
+            phase_seconds=dict(zip(PHASES, self._phase_times)) if local else None,
+            playout_lengths=dict(sorted(self._playout_lengths.items())) if local else None,
+        )
+        return report
+    
+    def _progress(self, progress, root: MCTSNode):
+        stats = {child.move: (child.visits, child.wins) for child in root.children}
+        best = max(stats, key=lambda m: stats[m][0]) if stats else None
+        progress(self._build_report(root, root.is_ai_turn, stats, best, full=False))
+    
+    def root_statistics(self, root_state: GameState, is_ai_turn: bool = True) -> Dict[Tuple[int, int], Tuple[int, float]]:
+        """Grow a tree for time_limit and return {move: (visits, wins)} for the root's children"""
+        root = self._grow_tree(root_state, is_ai_turn)
+        return {child.move: (child.visits, child.wins) for child in root.children}
+    
+    def reset_tree(self):
+        """Forget the tree kept for reuse"""
+        self._kept = None
+    
+    def _keep(self, root_state: GameState, node: MCTSNode):
+        position = root_state.clone()
+        position.apply_move(node.move, not node.is_ai_turn)
+        node.parent = None  # release the rest of the old tree
+        self._kept = (node, position)
+    
+    def _reusable_root(self, root_state: GameState, is_ai_turn: bool) -> Optional[MCTSNode]:
+        """Kept node whose position is root_state with is_ai_turn to move, detached from its parent"""
+        kept, self._kept = self._kept, None
+        if not self.reuse_tree or kept is None:
+            return None
+        node, position = kept
+        for child in node.children:
+            if child.is_ai_turn != is_ai_turn:
+                continue
+            position.make_move(child.move, node.is_ai_turn)
+            found = position == root_state
+            position.unmake_move()
+            if found:
+                child.parent = None
+                return child
+        return None
+    
+    def close(self):
+        """Shut down the worker pool, if one was started"""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+    
+    def _winning_move(self, root_state: GameState, is_ai_turn: bool) -> Optional[Tuple[int, int]]:
+        state = root_state.clone()
+        for move in state.get_moves(is_ai_turn):
+            state.make_move(move, is_ai_turn)
+            won = state.get_result(is_ai_turn) == 1.0
+            state.unmake_move()
+            if won:
+                return move
+        return None
+    
+    def _parallel_root_statistics(self, root_state: GameState, is_ai_turn: bool, stop=None,
+                                  progress=None) -> Dict[Tuple[int, int], Tuple[int, float]]:
+        if self._pool is None:
+            import multiprocessing  # only parallel searches pay for the import
+            self._pool = multiprocessing.Pool(self.workers)
+        base_seed = random.getrandbits(32)
+        jobs = [(root_state.ai, root_state.human, is_ai_turn, self.time_limit, self.exploration_constant,
+                 self.max_simulation_depth, self.tablebase, self.playout_batch, base_seed + i)
+                for i in range(self.workers)]
+        pending = self._pool.map_async(_root_statistics_worker, jobs, chunksize=1)
+        next_progress = time.perf_counter() + PROGRESS_INTERVAL
+        while not pending.ready():
+            if stop is not None and stop.is_set():
+                # The workers cannot see the event: end them, and start a new pool next search
+                self.close()
+                return {}
+            pending.wait(STOP_POLL_INTERVAL)
+            if progress is not None and time.perf_counter() >= next_progress:
+                progress(self._build_report(None, is_ai_turn, {}, None, full=False))
+                next_progress = time.perf_counter() + PROGRESS_INTERVAL
+        merged = {}
+        for stats in pending.get():
+            for move, (visits, wins) in stats.items():
+                total_visits, total_wins = merged.get(move, (0, 0.0))
+                merged[move] = (total_visits + visits, total_wins + wins)
+        return merged
+    
+    def _grow_tree(self, root_state: GameState, is_ai_turn: bool, root: Optional[MCTSNode] = None,
+                   stop=None, progress=None) -> MCTSNode:
+        if root is None:
+            root = MCTSNode(root_state, is_ai_turn=is_ai_turn)
+        state = root_state.clone()
+        
+        end_time = time.time() + self.time_limit
+        if self.playout_batch:
+            return self._grow_tree_batched(state, root, end_time, stop, progress)
+        iterations = 0
+        clock = time.perf_counter
+        phases = self._phase_times
+        next_progress = clock() + PROGRESS_INTERVAL
+        
+        # One state is walked down and back up the tree each iteration
+        while time.time() < end_time:
+            if stop is not None and stop.is_set():
+                break
+            
+            # 1-2. SELECTION and EXPANSION
+            node, made = self._descend(root, state)
+            
+            # 3. SIMULATION: Play random game from this position
+            simulated = clock()
+            result = self._simulate(state, node.is_ai_turn)
+            
+            # 4. BACKPROPAGATION: Update all nodes in path
+            propagated = clock()
+            while node is not None:
+                node.update(result)
+                node = node.parent
+            
+            for _ in range(made):
+                state.unmake_move()
+            
+            iterations += 1
+            now = clock()
+            phases[2] += propagated - simulated
+            phases[3] += now - propagated
+            if progress is not None and now >= next_progress:
+                self.iterations = self.playouts = iterations
+                self._progress(progress, root)
+                next_progress = now + PROGRESS_INTERVAL
+        
+        self.iterations = self.playouts = iterations
+        return root
+    
+    def _descend(self, root: MCTSNode, state: GameState) -> Tuple[MCTSNode, int]:
+        """Select down the tree with UCB1 and expand one child, making the moves on state"""
+        clock = time.perf_counter
+        start = clock()
+        node = root
+        made = 0
+        
+        # Navigate to leaf using UCB1
+        while not node.is_terminal() and node.is_fully_expanded():
+            node = node.select_child(self.exploration_constant)
+            state.make_move(node.move, not node.is_ai_turn)  # Apply move from parent's perspective
+            made += 1
+        
+        # Add new child if not terminal
+        selected = clock()
+        if not node.is_terminal() and node.untried_moves:
+            node = node.expand(state)
+            made += 1
+        
+        self._phase_times[0] += selected - start
+        self._phase_times[1] += clock() - selected
+        return node, made
+    
+    def _grow_tree_batched(self, state: GameState, root: MCTSNode, end_time: float, stop=None,
+                           progress=None) -> MCTSNode:
+        from . import batch
+        size = min(self.batch_leaves, self.playout_batch)  # playouts in the next batch
+        quickest = None  # seconds the quickest iteration took
+        last = per_playout = 0.0  # seconds the last iteration took, and per playout above the quickest
+        if self._rng is None:
+            self._rng = batch.np.random.default_rng(random.getrandbits(64))
+        self.iterations = self.playouts = 0
+        clock = time.perf_counter
+        phases = self._phase_times
+        lengths = self._playout_lengths
+        next_progress = clock() + PROGRESS_INTERVAL
+        
+        while True:
+            started = clock()
+            remaining = end_time - time.time()
+            if remaining <= 0 or (stop is not None and stop.is_set()):
+                break
+            if quickest is not None:
+                if remaining < quickest:
+                    break
+                budget = max(self.time_limit * BATCH_TIME_SHARE, 2 * quickest)
+                if last < budget:
+                    size = min(self.playout_batch, size * 2)
+                elif last > budget:
+                    size = max(1, size // 2)
+                if per_playout > 0:
+                    size = max(1, min(size, int((remaining - quickest) / per_playout)))
+            # Spread the playouts over as many leaves as allowed
+            n_leaves = min(self.batch_leaves, size)
+            per_leaf = size // n_leaves
+            
+            # Select several leaves; a virtual loss for the side that chose
+            # each node on the path keeps the next selection off it
+            leaves = []
+            for _ in range(n_leaves):
+                node, made = self._descend(root, state)
+                exact = self._exact_result(state, node.is_ai_turn)
+                if exact is not None:
+                    lengths[0] = lengths.get(0, 0) + per_leaf
+                leaves.append((node, state.ai, state.human, exact))
+                n = node
+                while n is not None:
+                    n.update(1.0 if n.is_ai_turn else 0.0)
+                    n = n.parent
+                for _ in range(made):
+                    state.unmake_move()
+            
+            simulated = clock()
+            pending = [leaf for leaf in leaves if leaf[3] is None]
+            if pending:
+                outcomes, plies = batch.random_playouts(
+                    [leaf[1] for leaf in pending for _ in range(per_leaf)],
+                    [leaf[2] for leaf in pending for _ in range(per_leaf)],
+                    [leaf[0].is_ai_turn for leaf in pending for _ in range(per_leaf)],
+                    self.max_simulation_depth, self._rng, return_plies=True,
+                    greedy=GREEDY_PLAYOUT_SHARE, greedy_candidates=GREEDY_CANDIDATES)
+                totals = iter(outcomes.reshape(len(pending), per_leaf).sum(axis=1).tolist())
+                for length, count in enumerate(batch.np.bincount(plies).tolist()):
+                    if count:
+                        lengths[length] = lengths.get(length, 0) + count
+            self.iterations += 1
+            self.playouts += len(leaves) * per_leaf
+            
+            # Replace each virtual loss with the leaf's real results
+            propagated = clock()
+            for node, _, _, exact in leaves:
+                total = exact * per_leaf if exact is not None else next(totals)
+                while node is not None:
+                    node.update(total - (1.0 if node.is_ai_turn else 0.0), per_leaf - 1)
+                    node = node.parent
+            
+            now = clock()
+            last = now - started
+            quickest = last if quickest is None else min(quickest, last)
+            per_playout = (last - quickest) / (len(leaves) * per_leaf)
+            phases[2] += propagated - simulated
+            phases[3] += now - propagated
+            if progress is not None and now >= next_progress:
+                self._progress(progress, root)
+                next_progress = now + PROGRESS_INTERVAL
+        
+        return root
+    
+    def _exact_result(self, state: GameState, is_ai_turn: bool) -> Optional[float]:
+        """Result from the AI's perspective if the game is over or the tablebase knows it"""
+        if state.is_terminal():
+            return state.get_result(True)
+        if self.tablebase is not None:
+            value = self.tablebase.probe(state, is_ai_turn)
+            if value is not None:
+                if value == 0:
+                    return 0.5
+                return 1.0 if (value > 0) == is_ai_turn else 0.0
+        return None
+    
+    def _simulate(self, state: GameState, is_ai_turn: bool) -> float:
+        """
+        Simulate random playout from current state
+        Returns result from AI perspective (1.0 = AI win, 0.0 = Human win);
+        state is left as it was found
+        """
+        result = self._exact_result(state, is_ai_turn)
+        if result is not None:
+            self._playout_lengths[0] = self._playout_lengths.get(0, 0) + 1
+            return result
+        
+        current_turn = is_ai_turn
+        depth = 0
+        
+        while not state.is_terminal() and depth < self.max_simulation_depth:
+            moves = state.get_moves(current_turn)
+            
+            if not moves:
+                break
+            
+            # Mix of random and greedy moves
+            if random.random() >= GREEDY_PLAYOUT_SHARE:
+                move = random.choice(moves)
+            else:
+                move = self._greedy_move(state, moves, current_turn)
+            
+            state.make_move(move, current_turn)
+            current_turn = not current_turn
+            depth += 1
+        
+        # Return result from AI perspective
+        if state.is_terminal():
+            result = state.get_result(True)
+        else:
+            # Use heuristic if didn't reach terminal
+            result = state.evaluate_heuristic()
+        
+        for _ in range(depth):
+            state.unmake_move()
+        self._playout_lengths[depth] = self._playout_lengths.get(depth, 0) + 1
+        return result
+    
+    def _greedy_move(self, state: GameState, moves: List[Tuple], is_ai: bool) -> Tuple:
+        """Select move with best immediate evaluation"""
+        best_move = moves[0]
+        best_score = -float('inf')
+        
+        # Evaluate a few moves (not all for speed)
+        for move in moves[:GREEDY_CANDIDATES]:
+            state.make_move(move, is_ai)
+            score = state.evaluate_heuristic()
+            state.unmake_move()
+            
+            # Flip score if opponent's turn
+            if not is_ai:
+                score = 1.0 - score
+            
+            if score > best_score:
+                best_score = score
+                best_move = move
+        
+        return best_move
+
+
+def _root_statistics_worker(job) -> Dict[Tuple[int, int], Tuple[int, float]]:
+    """Process-pool entry point for root-parallel search"""
+    ai, human, is_ai_turn, time_limit, exploration, max_simulation_depth, tablebase, playout_batch, seed = job
+    random.seed(seed)
+    mcts = MCTS(time_limit=time_limit, exploration_constant=exploration, tablebase=tablebase,
+                playout_batch=playout_batch)
+    mcts.max_simulation_depth = max_simulation_depth
+    return mcts.root_statistics(Position(ai, human), is_ai_turn)
@@ -0,0 +1,379 @@
+"""
+Depth-limited minimax with alpha-beta pruning over bitboard positions.
+"""
+
+import math
+import time
+from typing import List, Optional, Tuple
+
+from .board import NUM_NODES, WIN_SCORE, Position
+from .transposition import EXACT, LOWER, UPPER, TranspositionTable
+
+
+# Deepest iteration the iterative-deepening driver will start
+MAX_DEPTH = 64
+# Nodes searched between wall-clock checks
+CLOCK_CHECK_INTERVAL = 256
+
+# Move ordering priorities; history scores sit below KILLER_SCORE
+CAPTURE_SCORE = 1 << 30
+PV_SCORE = 1 << 29
+KILLER_SCORE = 1 << 28
+# History scores are halved when they reach this, and at each new search
+HISTORY_LIMIT = 1 << 24
+
+
+class SearchAborted(Exception):
+    """Raised inside the search when its time or node budget runs out"""
+
+
+class AlphaBeta:
+    """
+    Alpha-beta searcher backed by a transposition table
+
+    With a tablebase, leaves it covers are scored from it: a win in d plies
+    scores WIN_SCORE - d for the winner (so faster wins are preferred) and a
+    draw scores 0. With an opening book, root positions found in it are
+    answered with the book move without searching.
+    """
+
+    def __init__(self, table: Optional[TranspositionTable] = None, table_mb: float = 16, tablebase=None,
+                 book=None):
+        self.table = table if table is not None else TranspositionTable(table_mb)
+        self.tablebase = tablebase
+        self.book = book
+        self.from_book = False  # the last result came from the opening book
+        self.nodes = 0
+        self.depth_reached = 0
+        self.pv: List[Tuple[int, int]] = []
+        # Seconds from the start of the last iterative() to the end of each completed depth
+        self.depth_times: List[float] = []
+        self.result: Tuple[float, Optional[Tuple[int, int]]] = (0, None)
+        self.seconds = 0.0
+        self._deadline = None
+        self._node_limit = None
+        self._stop = None
+        self._iteration_depth = 0
+        # Two killer moves per ply, and a history score per side and (from, to)
+        self.killers = [[None, None] for _ in range(MAX_DEPTH + 1)]
+        self.history = [[0] * (NUM_NODES * NUM_NODES), [0] * (NUM_NODES * NUM_NODES)]
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def cutoff_stats(self) -> dict:
+        """Beta cut-offs of the last search, and how often the first move produced them"""
+        return {
+            'nodes': self.nodes,
+            'cutoffs': self.cutoffs,
+            'first_move_cutoffs': self.first_move_cutoffs,
+            'first_move_cutoff_rate': self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0,
+            'tt_hits': self.table.hits,
+        }
+
+    def search_report(self) -> dict:
+        """
+        Statistics of the last search: cutoff_stats() plus score, move,
+        depth (last completed), pv, seconds, nodes_per_sec, depth_times and
+        book (True when the move came from the opening book)
+        """
+        report = self.cutoff_stats()
+        report.update(
+            score=self.result[0],
+            move=self.result[1],
+            depth=self.depth_reached,
+            pv=list(self.pv),
+            seconds=self.seconds,
+            nodes_per_sec=self.nodes / self.seconds if self.seconds else 0.0,
+            depth_times=list(self.depth_times),
+            book=self.from_book,
+        )
+        return report
+
+    def _reset_stats(self):
+        self.nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.table.hits = 0
+        self.killers = [[None, None] for _ in range(MAX_DEPTH + 1)]
+        for table in self.history:
+            for i, value in enumerate(table):
+                if value:
+                    table[i] = value >> 1
+
+    def search(self, position: Position, depth: int, maxPlayer: bool) -> Tuple[float, Optional[Tuple[int, int]]]:
+        """Search position to depth and return (score, (from, to)) for the side to move"""
+        self._reset_stats()
+        self.pv = []
+        self.depth_times = []
+        if self._book_result(position, maxPlayer):
+            return self.result
+        self.table.new_search()
+        start = time.perf_counter()
+        self.result = self._mini_max_ab(position, depth, maxPlayer, -math.inf, math.inf, 0, False)
+        self.seconds = time.perf_counter() - start
+        self.depth_reached = depth
+        self.pv = self._principal_variation(position, maxPlayer, depth)
+        return self.result
+
+    def iterative(self, position: Position, maxPlayer: bool, time_limit: Optional[float] = None,
+                  node_limit: Optional[int] = None, max_depth: int = MAX_DEPTH, stop=None, progress=None):
+        """
+        Iterative deepening under a wall-clock (seconds) and/or node budget
+
+        Searches depth 1, 2, 3... and returns (score, move) from the last
+        completed iteration. Depth 1 always completes so a move is returned
+        whenever one exists; each iteration's principal variation is searched
+        first by the next. stop is an optional threading.Event that ends the
+        search like an exhausted budget. progress, if given, is called with
+        search_report() after each completed depth.
+        """
+        self._reset_stats()
+        self.depth_reached = 0
+        self.pv = []
+        self.depth_times = []
+        if self._book_result(position, maxPlayer):
+            if progress is not None:
+                progress(self.search_report())
+            return self.result
+        self.table.new_search()
+        start = time.perf_counter()
+        self._deadline = start + time_limit if time_limit is not None else None
+        self._node_limit = node_limit
+        self._stop = stop
+
+        best = position.minimax_score(), None
+        root_moves = len(position.get_moves(maxPlayer))
+        try:
+            for depth in range(1, max_depth + 1):
+                self._iteration_depth = depth
+                try:
+                    best = self._mini_max_ab(position, depth, maxPlayer, -math.inf, math.inf, 0, True)
+                except SearchAborted:
+                    break
+                self.depth_reached = depth
+                self.depth_times.append(time.perf_counter() - start)
+                self.pv = self._principal_variation(position, maxPlayer, depth)
+                self.result = best
+                self.seconds = self.depth_times[-1]
+                if progress is not None:
+                    progress(self.search_report())
+                # Nothing to gain from deeper search once the game is decided or forced
+                if abs(best[0]) >= WIN_SCORE or root_moves <= 1:
+                    break
+        finally:
+            self._deadline = None
+            self._node_limit = None
+            self._stop = None
+            self._iteration_depth = 0
+            self.result = best
+            self.seconds = time.perf_counter() - start
+        return best
+
+    def _book_result(self, position: Position, maxPlayer: bool) -> bool:
+        """Take result from the opening book if it has position; False when out of book"""
+        entry = self.book.probe(position, maxPlayer) if self.book is not None else None
+        self.from_book = entry is not None
+        if entry is None:
+            return False
+        move, score = entry
+        self.result = score, move
+        self.pv = [move]
+        self.depth_reached = 0
+        self.seconds = 0.0
+        return True
+
+    def _check_budget(self):
+        if self._iteration_depth <= 1:
+            return
+        if self._node_limit is not None and self.nodes >= self._node_limit:
+            raise SearchAborted()
+        if self.nodes % CLOCK_CHECK_INTERVAL == 0:
+            if self._deadline is not None and time.perf_counter() >= self._deadline:
+                raise SearchAborted()
+            if self._stop is not None and self._stop.is_set():
+                raise SearchAborted()
+
+    def _principal_variation(self, position: Position, maxPlayer: bool, depth: int) -> List[Tuple[int, int]]:
+        """Follow best moves stored in the transposition table"""
+        pv = []
+        position = position.clone()
+        for _ in range(depth):
+            entry = self.table.probe(position.hash_for(maxPlayer))
+            if entry is None or entry[3] is None or position.is_terminal():
+                break
+            move = entry[3]
+            if move not in position.get_moves(maxPlayer):
+                break
+            pv.append(move)
+            position.apply_move(move, maxPlayer)
+            maxPlayer = not maxPlayer
+        return pv
+
+    def _leaf_score(self, position: Position, maxPlayer: bool) -> int:
+        if self.tablebase is not None and not position.is_terminal():
+            value = self.tablebase.probe(position, maxPlayer)
+            if value is not None:
+                if not maxPlayer:
+                    value = -value
+                if value > 0:
+                    return WIN_SCORE - value
+                if value < 0:
+                    return -WIN_SCORE - value
+                return 0
+        return position.minimax_score()
+
+    def _order_moves(self, position: Position, maxPlayer: bool, ply: int,
+                     first: Optional[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Captures first, then the PV/table move, killers for this ply and history"""
+        moves = position.get_moves(maxPlayer)
+        if len(moves) < 2:
+            return moves
+        killers = self.killers[ply] if ply <= MAX_DEPTH else (None, None)
+        history = self.history[0 if maxPlayer else 1]
+
+        def priority(move):
+            score = history[move[0] * NUM_NODES + move[1]]
+            if position.capture_mask(move, maxPlayer):
+                score += CAPTURE_SCORE
+            if move == first:
+                score += PV_SCORE
+            elif move == killers[0] or move == killers[1]:
+                score += KILLER_SCORE
+            return score
+
+        moves.sort(key=priority, reverse=True)
+        return moves
+
+    def _record_cutoff(self, position: Position, move: Tuple[int, int], maxPlayer: bool,
+                       ply: int, depth: int, index: int):
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        if position.capture_mask(move, maxPlayer):
+            return
+        if ply <= MAX_DEPTH:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        history = self.history[0 if maxPlayer else 1]
+        code = move[0] * NUM_NODES + move[1]
+        history[code] += depth * depth
+        if history[code] >= HISTORY_LIMIT:
+            for i, value in enumerate(history):
+                history[i] = value >> 1
+
+    def _mini_max_ab(self, position: Position, depth: int, maxPlayer: bool, alpha: float, beta: float,
+                     ply: int, on_pv: bool):
+        self.nodes += 1
+        if self._deadline is not None or self._node_limit is not None or self._stop is not None:
+            self._check_budget()
+        key = position.hash_for(maxPlayer)
+
+        # Transposition table lookup
+        tt_move = None
+        entry = self.table.probe(key)
+        if entry is not None:
+            tt_depth, bound, score, tt_move = entry
+            if tt_depth >= depth:
+                if bound == EXACT:
+                    return score, tt_move
+                if bound == LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if beta <= alpha:
+                    return score, tt_move
+
+        # Leaf evaluation
+        if depth == 0 or position.is_terminal():
+            score = self._leaf_score(position, maxPlayer)
+            self.table.store(key, depth, EXACT, score, None)
+            return score, None
+
+        # Previous iteration's principal variation, else the table's best move
+        first = self.pv[ply] if on_pv and ply < len(self.pv) else tt_move
+        moves = self._order_moves(position, maxPlayer, ply, first)
+        on_pv = on_pv and bool(moves) and moves[0] == first
+
+        alpha_orig, beta_orig = alpha, beta
+        best_move = None
+        if maxPlayer:
+            maxEle = -math.inf
+            for index, move in enumerate(moves):
+                child = position.clone()
+                child.apply_move(move, True)
+                result, _ = self._mini_max_ab(child, depth - 1, False, alpha, beta, ply + 1, on_pv)
+                on_pv = False
+                if result > maxEle:
+                    maxEle = result
+                    best_move = move
+
+                # alpha-beta update and prune
+                alpha = max(alpha, result)
+                if beta <= alpha:
+                    self._record_cutoff(position, move, True, ply, depth, index)
+                    break
+            best = maxEle
+        else:
+            minEle = math.inf
+            for index, move in enumerate(moves):
+                child = position.clone()
+                child.apply_move(move, False)
+                result, _ = self._mini_max_ab(child, depth - 1, True, alpha, beta, ply + 1, on_pv)
+                on_pv = False
+                if result < minEle:
+                    minEle = result
+                    best_move = move
+
+                # alpha-beta update and prune
+                beta = min(beta, result)
+                if beta <= alpha:
+                    self._record_cutoff(position, move, False, ply, depth, index)
+                    break
+            best = minEle
+
+        if best_move is None:
+            return best, None
+        if best <= alpha_orig:
+            bound = UPPER
+        elif best >= beta_orig:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table.store(key, depth, bound, best, best_move)
+        return best, best_move
+
+
+_searcher = None
+
+
+def mini_max_move(position: Position, depth: int, maxPlayer: bool, time_limit: Optional[float] = None,
+                  node_limit: Optional[int] = None, stop=None, tablebase=None, progress=None,
+                  book=None) -> Tuple[float, Optional[Tuple[int, int]]]:
+    """
+    Search position with a shared, lazily created AlphaBeta searcher
+
+    Without a budget this is a fixed-depth search; with time_limit (seconds),
+    node_limit or a stop event it deepens iteratively up to depth, calling
+    the optional progress callback after each depth. Leaves covered by the
+    optional endgame tablebase are scored from it, and positions in the
+    optional opening book are answered from it. last_search_report()
+    describes the search afterwards.
+    """
+    global _searcher
+    if _searcher is None:
+        _searcher = AlphaBeta()
+    if tablebase is not _searcher.tablebase:
+        _searcher.tablebase = tablebase
+        _searcher.table.clear()
+    _searcher.book = book
+    if time_limit is None and node_limit is None and stop is None:
+        return _searcher.search(position, depth, maxPlayer)
+    return _searcher.iterative(position, maxPlayer, time_limit, node_limit, max_depth=depth, stop=stop,
+                               progress=progress)
+
+
+def last_search_report() -> Optional[dict]:
+    """AlphaBeta.search_report() of the last mini_max_move call, or None before the first"""
+    return _searcher.search_report() if _searcher is not None else None
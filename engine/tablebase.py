@@ -0,0 +1,370 @@
+"""
+Endgame tablebase built by retrograde analysis.
+
+Positions are grouped into classes by bead counts (AI beads, human beads)
+and side to move. Inside a class every position has a perfect index: the
+colex rank of the AI bead set among the 21 nodes, times the number of human
+sets, plus the colex rank of the human bead set among the nodes the AI does
+not occupy. Each entry is one signed byte for the side to move:
+
+    0      draw (neither side can force the game to end)
+    +d     win, the game ends d plies from here with best play
+    -d     loss in d plies
+
+Distances saturate at MAX_DISTANCE. A capture always moves play into a
+class with fewer beads (or ends the game), so classes are solved smallest
+first and captures are resolved by probing the classes already solved.
+
+Build from the command line, e.g. every class with at most 4 beads a side:
+
+    python -m engine.tablebase build endgame.tb --max-beads 4
+"""
+
+import argparse
+import itertools
+import mmap
+import struct
+import sys
+import time
+from array import array
+from math import comb
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .board import FULL_MASK, MIN_BEADS, NEIGHBOUR_MASKS, NUM_NODES, Position, bits, captures, popcount
+
+MAGIC = b'DCTB'
+VERSION = 2
+MAX_BEADS = 6
+MAX_DISTANCE = 127
+DRAW = 0
+
+_HEADER = struct.Struct('<4sHH')  # magic, version, section count
+_SECTION = struct.Struct('<BBBxQQ')  # ai beads, human beads, ai to move, offset, length
+
+# _COMBINATIONS[n][k]: k-subsets of range(n) as masks, in colex (rank) order
+_COMBINATIONS: Dict[Tuple[int, int], List[int]] = {}
+# _AI_RANK[k]: AI bead mask -> colex rank among the full board
+_AI_RANK: Dict[int, Dict[int, int]] = {}
+
+
+def _combinations(n: int, k: int) -> List[int]:
+    subsets = _COMBINATIONS.get((n, k))
+    if subsets is None:
+        subsets = [sum(1 << i for i in c) for c in itertools.combinations(range(n), k)]
+        subsets.sort(key=_colex_rank)
+        _COMBINATIONS[(n, k)] = subsets
+    return subsets
+
+
+def _colex_rank(mask: int) -> int:
+    return sum(comb(node, i) for i, node in enumerate(bits(mask), 1))
+
+
+def _ai_rank(k: int) -> Dict[int, int]:
+    ranks = _AI_RANK.get(k)
+    if ranks is None:
+        ranks = {mask: r for r, mask in enumerate(_combinations(NUM_NODES, k))}
+        _AI_RANK[k] = ranks
+    return ranks
+
+
+def class_size(n_ai: int, n_human: int) -> int:
+    return comb(NUM_NODES, n_ai) * comb(NUM_NODES - n_ai, n_human)
+
+
+def rank(ai: int, human: int) -> int:
+    """Perfect index of a bead layout within its (AI beads, human beads) class"""
+    n_ai = popcount(ai)
+    index = 0
+    for i, node in enumerate(bits(human), 1):
+        # Position of the node among the nodes the AI does not occupy
+        index += comb(node - popcount(ai & ((1 << node) - 1)), i)
+    return _ai_rank(n_ai)[ai] * comb(NUM_NODES - n_ai, popcount(human)) + index
+
+
+def unrank(n_ai: int, n_human: int, index: int) -> Tuple[int, int]:
+    """Bead layout (ai, human) at index in its class"""
+    ai_index, human_index = divmod(index, comb(NUM_NODES - n_ai, n_human))
+    ai = _combinations(NUM_NODES, n_ai)[ai_index]
+    free = [node for node in range(NUM_NODES) if not ai >> node & 1]
+    compressed = _combinations(NUM_NODES - n_ai, n_human)[human_index]
+    return ai, sum(1 << free[j] for j in bits(compressed))
+
+
+def _play(ai: int, human: int, src: int, dst: int, ai_moves: bool) -> Tuple[int, int]:
+    """Position.apply_move on raw masks"""
+    step = (1 << src) | (1 << dst)
+    if ai_moves:
+        ai ^= step
+    else:
+        human ^= step
+    ai_lost, human_lost = captures(ai, human, NEIGHBOUR_MASKS[dst] | (1 << dst))
+    return ai & ~ai_lost, human & ~human_lost
+
+
+def _to_byte(value: int) -> int:
+    return max(-MAX_DISTANCE, min(MAX_DISTANCE, value)) & 0xFF
+
+
+def _from_byte(byte: int) -> int:
+    return byte - 256 if byte > 127 else byte
+
+
+def _better(value: int, other: int) -> bool:
+    """Whether value is preferred by the side to move: the quickest win, then a draw, then the slowest loss"""
+    if (value > 0) != (other > 0):
+        return value > 0
+    if value > 0:
+        return value < other
+    return (value == DRAW) > (other == DRAW) or (value < 0 and other < 0 and value < other)
+
+
+class _Builder:
+    """Retrograde solver for all classes up to max_beads beads a side"""
+
+    def __init__(self, max_beads: int, log: Callable[[str], None]):
+        self.max_beads = max_beads
+        self.log = log
+        self.sections: Dict[Tuple[int, int, bool], bytearray] = {}
+
+    def classes(self) -> List[Tuple[int, int]]:
+        counts = range(MIN_BEADS, self.max_beads + 1)
+        return sorted(((a, h) for a in counts for h in counts), key=lambda c: (c[0] + c[1], c))
+
+    def build(self, verify: bool = False):
+        for n_ai, n_human in self.classes():
+            start = time.time()
+            self._solve_class(n_ai, n_human)
+            self.log('class %dv%d: %d positions per side in %.1fs'
+                     % (n_ai, n_human, class_size(n_ai, n_human), time.time() - start))
+            if verify:
+                bad = self.verify_class(n_ai, n_human)
+                if bad:
+                    raise ValueError('class %dv%d: %d values differ from the best over their children'
+                                     % (n_ai, n_human, bad))
+
+    def _exit_value(self, ai: int, human: int, ai_moved: bool) -> int:
+        """Value for the mover of a capture that left its class"""
+        n_ai, n_human = popcount(ai), popcount(human)
+        if n_human < MIN_BEADS:
+            return 1 if ai_moved else -1
+        if n_ai < MIN_BEADS:
+            return -1 if ai_moved else 1
+        child = _from_byte(self.sections[(n_ai, n_human, not ai_moved)][rank(ai, human)])
+        if child < 0:
+            return -child + 1
+        if child > 0:
+            return -(child + 1)
+        return DRAW
+
+    def verify_class(self, n_ai: int, n_human: int) -> int:
+        """Number of stored values in a solved class that are not the best value over their children"""
+        bad = 0
+        for ai_to_move in (True, False):
+            values = self.sections[(n_ai, n_human, ai_to_move)]
+            replies = self.sections[(n_ai, n_human, not ai_to_move)]
+            for index in range(class_size(n_ai, n_human)):
+                ai, human = unrank(n_ai, n_human, index)
+                empty = FULL_MASK & ~(ai | human)
+                best = None
+                for src in bits(ai if ai_to_move else human):
+                    for dst in bits(NEIGHBOUR_MASKS[src] & empty):
+                        child_ai, child_human = _play(ai, human, src, dst, ai_to_move)
+                        if popcount(child_ai) == n_ai and popcount(child_human) == n_human:
+                            child = _from_byte(replies[rank(child_ai, child_human)])
+                            value = -child + 1 if child < 0 else -(child + 1) if child > 0 else DRAW
+                        else:
+                            value = self._exit_value(child_ai, child_human, ai_to_move)
+                        if best is None or _better(value, best):
+                            best = value
+                if values[index] != _to_byte(DRAW if best is None else best):
+                    bad += 1
+        return bad
+
+    def _solve_class(self, n_ai: int, n_human: int):
+        size = class_size(n_ai, n_human)
+        human_sets = comb(NUM_NODES - n_ai, n_human)
+        compressed = _combinations(NUM_NODES - n_ai, n_human)
+        values = {True: bytearray(size), False: bytearray(size)}
+        counts = {True: bytearray(size), False: bytearray(size)}
+        # Longest exit loss per position; 255 when some exit is a draw or a win,
+        # so the position can never settle as a loss
+        exit_loss = {True: bytearray(size), False: bytearray(size)}
+        buckets: Dict[int, array] = {}
+
+        def push(distance, index, ai_to_move, is_loss):
+            bucket = buckets.get(distance)
+            if bucket is None:
+                bucket = buckets[distance] = array('Q')
+            bucket.append((index << 2) | (ai_to_move << 1) | is_loss)
+
+        # Forward pass: count same-class children, settle moves that capture
+        for ai_index, ai in enumerate(_combinations(NUM_NODES, n_ai)):
+            free = [node for node in range(NUM_NODES) if not ai >> node & 1]
+            base = ai_index * human_sets
+            for human_index, packed in enumerate(compressed):
+                human = 0
+                for j in bits(packed):
+                    human |= 1 << free[j]
+                empty = FULL_MASK & ~(ai | human)
+                index = base + human_index
+                for ai_to_move in (True, False):
+                    children = 0
+                    best_win = 0
+                    worst_loss = 0
+                    open_exit = False
+                    for src in bits(ai if ai_to_move else human):
+                        for dst in bits(NEIGHBOUR_MASKS[src] & empty):
+                            child_ai, child_human = _play(ai, human, src, dst, ai_to_move)
+                            if popcount(child_ai) == n_ai and popcount(child_human) == n_human:
+                                children += 1
+                                continue
+                            value = self._exit_value(child_ai, child_human, ai_to_move)
+                            if value > 0:
+                                best_win = value if not best_win else min(best_win, value)
+                            elif value < 0:
+                                worst_loss = max(worst_loss, -value)
+                            else:
+                                open_exit = True
+                    counts[ai_to_move][index] = children
+                    exit_loss[ai_to_move][index] = 255 if open_exit or best_win else min(worst_loss, 254)
+                    if best_win:
+                        push(best_win, index, ai_to_move, 0)
+                    elif children == 0 and worst_loss and not open_exit:
+                        push(worst_loss, index, ai_to_move, 1)
+
+        # Retrograde pass: settle positions in order of distance
+        distance = 0
+        while buckets:
+            distance += 1
+            bucket = buckets.pop(distance, None)
+            if bucket is None:
+                continue
+            for entry in bucket:
+                index, ai_to_move, is_loss = entry >> 2, bool(entry >> 1 & 1), entry & 1
+                if values[ai_to_move][index]:
+                    continue
+                values[ai_to_move][index] = _to_byte(-distance if is_loss else distance)
+                ai, human = unrank(n_ai, n_human, index)
+                empty = FULL_MASK & ~(ai | human)
+                # Predecessors: the other side moved one of its beads here
+                mover = not ai_to_move
+                beads = ai if mover else human
+                parent_values = values[mover]
+                for dst in bits(beads):
+                    for src in bits(NEIGHBOUR_MASKS[dst] & empty):
+                        step = (1 << src) | (1 << dst)
+                        parent_ai, parent_human = (ai ^ step, human) if mover else (ai, human ^ step)
+                        if _play(parent_ai, parent_human, src, dst, mover) != (ai, human):
+                            continue
+                        parent = rank(parent_ai, parent_human)
+                        if parent_values[parent]:
+                            continue
+                        if is_loss:
+                            push(distance + 1, parent, mover, 0)
+                        else:
+                            counts[mover][parent] -= 1
+                            if counts[mover][parent] == 0 and exit_loss[mover][parent] != 255:
+                                push(max(distance + 1, exit_loss[mover][parent]), parent, mover, 1)
+
+        self.sections[(n_ai, n_human, True)] = values[True]
+        self.sections[(n_ai, n_human, False)] = values[False]
+
+    def write(self, path: str):
+        keys = sorted(self.sections, key=lambda k: (k[0], k[1], not k[2]))
+        offset = _HEADER.size + _SECTION.size * len(keys)
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, len(keys)))
+            for n_ai, n_human, ai_to_move in keys:
+                length = len(self.sections[(n_ai, n_human, ai_to_move)])
+                f.write(_SECTION.pack(n_ai, n_human, ai_to_move, offset, length))
+                offset += length
+            for key in keys:
+                f.write(self.sections[key])
+
+
+class Tablebase:
+    """Read-only, memory-mapped tablebase file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('%s is not a version %d Diamond Chase tablebase' % (path, VERSION))
+        self._sections = {}
+        for i in range(count):
+            n_ai, n_human, ai_to_move, offset, _ = _SECTION.unpack_from(self._map, _HEADER.size + i * _SECTION.size)
+            self._sections[(n_ai, n_human, bool(ai_to_move))] = offset
+        self.hits = 0
+
+    @classmethod
+    def open_if_exists(cls, path: str) -> Optional['Tablebase']:
+        try:
+            return cls(path)
+        except FileNotFoundError:
+            return None
+
+    def covers(self, n_ai: int, n_human: int) -> bool:
+        return (n_ai, n_human, True) in self._sections
+
+    def probe(self, position: Position, is_ai_turn: bool) -> Optional[int]:
+        """Signed distance for the side to move (see module docstring), or None if not covered"""
+        offset = self._sections.get((popcount(position.ai), popcount(position.human), is_ai_turn))
+        if offset is None:
+            return None
+        self.hits += 1
+        return _from_byte(self._map[offset + rank(position.ai, position.human)])
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __getstate__(self):
+        return self.path
+
+    def __setstate__(self, path):
+        self.__init__(path)
+
+
+def build(path: str, max_beads: int = MIN_BEADS, log: Callable[[str], None] = print, verify: bool = False):
+    """
+    Solve every class with MIN_BEADS..max_beads beads a side and write it to path
+
+    With verify, every solved class is re-checked against its children
+    before the next one is built, which re-scores every move of every position.
+    """
+    if not MIN_BEADS <= max_beads <= MAX_BEADS:
+        raise ValueError('max_beads must be between %d and %d' % (MIN_BEADS, MAX_BEADS))
+    builder = _Builder(max_beads, log)
+    builder.build(verify)
+    builder.write(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Diamond Chase endgame tablebase')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build_cmd = sub.add_parser('build', help='generate a tablebase file')
+    build_cmd.add_argument('path')
+    build_cmd.add_argument('--max-beads', type=int, default=MIN_BEADS,
+                           help='largest bead count per side to cover (default %(default)s)')
+    build_cmd.add_argument('--verify', action='store_true',
+                           help='check every value against its children after solving each class')
+    probe_cmd = sub.add_parser('probe', help='look up the starting position or given masks')
+    probe_cmd.add_argument('path')
+    probe_cmd.add_argument('ai', type=lambda s: int(s, 0))
+    probe_cmd.add_argument('human', type=lambda s: int(s, 0))
+    probe_cmd.add_argument('--human-to-move', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        build(args.path, args.max_beads, verify=args.verify)
+    else:
+        value = Tablebase(args.path).probe(Position(args.ai, args.human), not args.human_to_move)
+        print('not covered' if value is None else value)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,273 @@
+"""
+Headless engine-vs-engine tournaments.
+
+Games are played on a process pool without any rendering or move delay.
+Each pair of games starts from the same random opening with colours
+swapped, and the report gives player A's win/draw/loss record, the Elo
+difference with a confidence interval, and per-move latency percentiles
+for both players:
+
+    python -m engine.tournament minimax:time=0.1 mcts:time=0.1 --games 200
+    python -m engine.tournament "mcts:time=0.05,batch=256" "mcts:time=0.05" --games 1000 --json out.json
+
+A player is ``engine[:key=value,...]`` with engine one of minimax, mcts or
+random. minimax takes time (seconds), nodes and depth; mcts takes time,
+c (exploration constant), batch (playouts per iteration) and reuse (0/1).
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .board import Position
+from .mcts import MCTS
+from .minimax import MAX_DEPTH, AlphaBeta
+
+# Plies after which an undecided game is scored as a draw
+MAX_PLIES = 200
+# z for a two-sided 95% confidence interval
+Z_95 = 1.959964
+
+_PARAMS = {
+    'minimax': {'time': float, 'nodes': int, 'depth': int},
+    'mcts': {'time': float, 'c': float, 'batch': int, 'reuse': int},
+    'random': {},
+}
+
+
+def parse_player(spec: str) -> Tuple[str, Dict]:
+    """'mcts:time=0.1,c=1.2' -> ('mcts', {'time': 0.1, 'c': 1.2})"""
+    engine, _, args = spec.partition(':')
+    if engine not in _PARAMS:
+        raise ValueError('unknown engine %r (expected one of %s)' % (engine, ', '.join(_PARAMS)))
+    params = {}
+    for item in filter(None, args.split(',')):
+        key, _, value = item.partition('=')
+        if key not in _PARAMS[engine]:
+            raise ValueError('%s does not take %r' % (engine, key))
+        params[key] = _PARAMS[engine][key](value)
+    return engine, params
+
+
+def make_player(spec: str, tablebase=None, book=None) -> Callable[[Position, bool], Optional[Tuple[int, int]]]:
+    """A move function (position, ai_to_move) -> move for a player spec"""
+    engine, params = parse_player(spec)
+    if engine == 'minimax':
+        searcher = AlphaBeta(tablebase=tablebase, book=book)
+        time_limit = params.get('time', 0.1 if 'nodes' not in params else None)
+
+        def minimax_move(position, ai_to_move):
+            return searcher.iterative(position, ai_to_move, time_limit=time_limit, node_limit=params.get('nodes'),
+                                      max_depth=params.get('depth', MAX_DEPTH))[1]
+        return minimax_move
+    if engine == 'mcts':
+        mcts = MCTS(time_limit=params.get('time', 0.1), exploration_constant=params.get('c', 1.414),
+                    reuse_tree=bool(params.get('reuse', 1)), tablebase=tablebase,
+                    playout_batch=params.get('batch', 0), book=book)
+        return mcts.search
+
+    def random_move(position, ai_to_move):
+        moves = position.get_moves(ai_to_move)
+        return random.choice(moves) if moves else None
+    return random_move
+
+
+def random_opening(seed: int, plies: int) -> Tuple[Position, bool]:
+    """(position, AI to move) after plies uniformly random moves from the start (AI moves first)"""
+    rng = random.Random(seed)
+    position = Position()
+    ai_to_move = True
+    for _ in range(plies):
+        moves = position.get_moves(ai_to_move)
+        child = position.clone()
+        child.apply_move(rng.choice(moves), ai_to_move)
+        if child.is_terminal():
+            break
+        position = child
+        ai_to_move = not ai_to_move
+    return position, ai_to_move
+
+
+def play_game(job) -> Dict:
+    """
+    Process-pool entry point: play one game and return its record
+
+    job is (game index, player A spec, player B spec, A plays the AI side,
+    opening seed, opening plies, max plies, tablebase path or None,
+    opening book path or None).
+    """
+    index, spec_a, spec_b, a_is_ai, opening_seed, opening_plies, max_plies, tablebase_path, book_path = job
+    random.seed(opening_seed * 2 + a_is_ai)
+    tablebase = None
+    if tablebase_path:
+        from .tablebase import Tablebase
+        tablebase = Tablebase(tablebase_path)
+    book = None
+    if book_path:
+        from .book import OpeningBook
+        book = OpeningBook(book_path)
+    players = {a_is_ai: make_player(spec_a, tablebase, book), not a_is_ai: make_player(spec_b, tablebase, book)}
+    latencies = {True: [], False: []}  # keyed by "is player A"
+
+    position, ai_to_move = random_opening(opening_seed, opening_plies)
+    plies = 0
+    while not position.is_terminal() and plies < max_plies:
+        start = time.perf_counter()
+        move = players[ai_to_move](position, ai_to_move)
+        latencies[ai_to_move == a_is_ai].append(time.perf_counter() - start)
+        if move is None or move not in position.get_moves(ai_to_move):
+            # A missing or illegal move forfeits the game
+            winner_is_ai = not ai_to_move
+            break
+        position.apply_move(move, ai_to_move)
+        ai_to_move = not ai_to_move
+        plies += 1
+    else:
+        winner_is_ai = None if not position.is_terminal() else position.get_result(True) == 1.0
+
+    score_a = 0.5 if winner_is_ai is None else float(winner_is_ai == a_is_ai)
+    if tablebase is not None:
+        tablebase.close()
+    return {'game': index, 'a_is_ai': a_is_ai, 'score_a': score_a, 'plies': plies,
+            'latency_a': latencies[True], 'latency_b': latencies[False]}
+
+
+def elo(score: float) -> float:
+    """Elo difference implied by an expected score in (0, 1)"""
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400.0 * math.log10(1.0 / score - 1.0)
+
+
+def wilson_interval(score: float, games: int, z: float = Z_95) -> Tuple[float, float]:
+    """Wilson score interval for the expected score; stays inside (0, 1) even after a sweep"""
+    if not games:
+        return 0.0, 1.0
+    denominator = 1 + z * z / games
+    centre = (score + z * z / (2 * games)) / denominator
+    half = z * math.sqrt(score * (1 - score) / games + z * z / (4 * games * games)) / denominator
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+def percentiles(values: List[float], points=(50, 90, 99)) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    result = {}
+    for p in points:
+        rank = min(len(ordered) - 1, max(0, int(math.ceil(p / 100.0 * len(ordered))) - 1))
+        result['p%d' % p] = ordered[rank]
+    result['max'] = ordered[-1]
+    result['mean'] = sum(ordered) / len(ordered)
+    return result
+
+
+def summarize(records: List[Dict], spec_a: str, spec_b: str) -> Dict:
+    n = len(records)
+    scores = [r['score_a'] for r in records]
+    wins = sum(1 for s in scores if s == 1.0)
+    losses = sum(1 for s in scores if s == 0.0)
+    mean = sum(scores) / n if n else 0.5
+    low, high = wilson_interval(mean, n)
+    return {
+        'player_a': spec_a,
+        'player_b': spec_b,
+        'games': n,
+        'wins': wins,
+        'draws': n - wins - losses,
+        'losses': losses,
+        'score': mean,
+        'elo': elo(mean),
+        'elo_95': [elo(low), elo(high)],
+        'mean_plies': sum(r['plies'] for r in records) / n if n else 0.0,
+        'latency_a': percentiles([t for r in records for t in r['latency_a']]),
+        'latency_b': percentiles([t for r in records for t in r['latency_b']]),
+    }
+
+
+def run(spec_a: str, spec_b: str, games: int, workers: int = 0, seed: int = 0, opening_plies: int = 4,
+        max_plies: int = MAX_PLIES, tablebase_path: Optional[str] = None, book_path: Optional[str] = None,
+        log: Callable[[str], None] = lambda line: None) -> Dict:
+    """Play games between two player specs and return the summary plus per-game records"""
+    parse_player(spec_a)
+    parse_player(spec_b)
+    jobs = [(i, spec_a, spec_b, i % 2 == 0, seed + i // 2, opening_plies, max_plies, tablebase_path, book_path)
+            for i in range(games)]
+    workers = workers or os.cpu_count() or 1
+    records = []
+    if workers == 1:
+        results = map(play_game, jobs)
+        pool = None
+    else:
+        import multiprocessing
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap_unordered(play_game, jobs)
+    try:
+        for record in results:
+            records.append(record)
+            log('game %d/%d: %s' % (len(records), games, {1.0: 'A wins', 0.0: 'B wins', 0.5: 'draw'}[record['score_a']]))
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    records.sort(key=lambda r: r['game'])
+    return {'summary': summarize(records, spec_a, spec_b), 'games': records}
+
+
+def _format(summary: Dict) -> str:
+    def latency(stats):
+        if not stats:
+            return 'n/a'
+        return 'p50 %.1f ms, p90 %.1f ms, p99 %.1f ms, max %.1f ms' % (
+            stats['p50'] * 1000, stats['p90'] * 1000, stats['p99'] * 1000, stats['max'] * 1000)
+    low, high = summary['elo_95']
+    return '\n'.join([
+        'A: %s' % summary['player_a'],
+        'B: %s' % summary['player_b'],
+        'games %d: A +%d =%d -%d (score %.3f, %.1f plies/game)' % (
+            summary['games'], summary['wins'], summary['draws'], summary['losses'], summary['score'],
+            summary['mean_plies']),
+        'Elo A-B: %+.0f (95%% CI %+.0f .. %+.0f)' % (summary['elo'], low, high),
+        'latency A: %s' % latency(summary['latency_a']),
+        'latency B: %s' % latency(summary['latency_b']),
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Headless Diamond Chase engine tournament',
+                                     epilog='players: minimax[:time=,nodes=,depth=] | mcts[:time=,c=,batch=,reuse=] | random')
+    parser.add_argument('player_a')
+    parser.add_argument('player_b')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=0, help='processes (default: one per CPU)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first opening')
+    parser.add_argument('--opening-plies', type=int, default=4, help='random plies before the engines take over')
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES, help='plies before a game is drawn')
+    parser.add_argument('--tablebase', help='endgame tablebase file for both players')
+    parser.add_argument('--book', help='opening book file for both players')
+    parser.add_argument('--json', help='also write the summary and per-game records here')
+    parser.add_argument('--quiet', action='store_true', help='no per-game progress')
+    args = parser.parse_args(argv)
+
+    try:
+        parse_player(args.player_a)
+        parse_player(args.player_b)
+    except ValueError as e:
+        parser.error(str(e))
+
+    report = run(args.player_a, args.player_b, args.games, args.workers, args.seed, args.opening_plies,
+                 args.max_plies, args.tablebase, args.book,
+                 log=(lambda line: None) if args.quiet else (lambda line: print(line, file=sys.stderr)))
+    print(_format(report['summary']))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
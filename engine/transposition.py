@@ -0,0 +1,80 @@
+"""
+Fixed-size transposition table for the alpha-beta search.
+
+Entries live in parallel typed arrays so the table's memory is known up
+front; slots are indexed by the low bits of the Zobrist key.
+"""
+
+from array import array
+from typing import Optional, Tuple
+
+from .board import NUM_NODES
+
+# Bound types
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+NO_MOVE = -1
+# key (8) + score (4) + move (2) + depth (1) + bound (1) + generation (1)
+ENTRY_BYTES = 17
+
+
+def encode_move(move: Optional[Tuple[int, int]]) -> int:
+    return NO_MOVE if move is None else move[0] * NUM_NODES + move[1]
+
+
+def decode_move(code: int) -> Optional[Tuple[int, int]]:
+    return None if code == NO_MOVE else divmod(code, NUM_NODES)
+
+
+class TranspositionTable:
+    """Memory-capped, depth-preferred transposition table"""
+
+    def __init__(self, size_mb: float = 16):
+        slots = 1
+        while slots * 2 * ENTRY_BYTES <= size_mb * 1024 * 1024:
+            slots *= 2
+        self.size = slots
+        self.mask = slots - 1
+        self.generation = 0
+        self.keys = array('Q', [0]) * slots
+        self.scores = array('i', [0]) * slots
+        self.moves = array('h', [NO_MOVE]) * slots
+        self.depths = array('b', [-1]) * slots
+        self.bounds = array('B', [EXACT]) * slots
+        self.ages = array('B', [0]) * slots
+        self.hits = 0
+        self.stores = 0
+
+    def clear(self):
+        self.depths = array('b', [-1]) * self.size
+        self.generation = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self):
+        """Age existing entries so a new search may overwrite them"""
+        self.generation = (self.generation + 1) & 0xFF
+
+    def probe(self, key: int) -> Optional[Tuple[int, int, int, Optional[Tuple[int, int]]]]:
+        """Return (depth, bound, score, best_move) stored for key, or None"""
+        i = key & self.mask
+        if self.depths[i] < 0 or self.keys[i] != key:
+            return None
+        self.hits += 1
+        return self.depths[i], self.bounds[i], self.scores[i], decode_move(self.moves[i])
+
+    def store(self, key: int, depth: int, bound: int, score: int, move: Optional[Tuple[int, int]]):
+        """Store an entry, keeping a deeper one from the current search in place"""
+        i = key & self.mask
+        if (self.depths[i] >= 0 and self.keys[i] != key
+                and self.ages[i] == self.generation and self.depths[i] > depth):
+            return
+        self.keys[i] = key
+        self.scores[i] = int(score)
+        self.moves[i] = encode_move(move)
+        self.depths[i] = depth
+        self.bounds[i] = bound
+        self.ages[i] = self.generation
+        self.stores += 1
@@ -0,0 +1,151 @@
+"""
+Background runner so a front end can keep drawing while the engine thinks.
+
+The engines are pure Python, so a search on a thread would share the GIL
+with the render loop and cost it frames. SearchWorker instead keeps one
+process that holds the engines, which are passed in once, so transposition
+tables and reused trees stay warm between moves. Requests and results go
+over queues, and cancellation goes through a shared request number.
+"""
+
+import atexit
+import itertools
+import multiprocessing
+import os
+import queue
+import traceback
+from typing import Any, Dict, Optional, Tuple
+
+# Value of the shared request number while no search is wanted
+CANCELLED = 0
+# Seconds the idle worker waits for a request before checking its parent is alive
+PARENT_CHECK_INTERVAL = 0.5
+# Scheduling priority the worker drops by (POSIX), so on few cores the front
+# end gets the CPU whenever it wants it and the search takes the rest
+WORKER_NICENESS = 10
+
+
+class _Stop:
+    """threading.Event stand-in the engines poll: set once its request is no longer the wanted one"""
+
+    def __init__(self, wanted, request: int):
+        self._wanted = wanted
+        self._request = request
+
+    def is_set(self) -> bool:
+        return self._wanted.value != self._request
+
+
+def _serve(engines: Dict[str, Any], requests, results, wanted):
+    """Worker process main loop: run requests one at a time until told to stop"""
+    parent = multiprocessing.parent_process()
+    if hasattr(os, 'nice'):
+        os.nice(WORKER_NICENESS)
+    while True:
+        try:
+            request = requests.get(timeout=PARENT_CHECK_INTERVAL)
+        except queue.Empty:
+            if parent is not None and not parent.is_alive():
+                return
+            continue
+        if request is None:
+            return
+        request_id, name, method, args, kwargs, report_progress = request
+        stop = _Stop(wanted, request_id)
+        if stop.is_set():
+            continue  # cancelled before it started
+        if report_progress:
+            kwargs['progress'] = lambda report: results.put(('progress', request_id, report))
+        try:
+            result = getattr(engines[name], method)(*args, stop=stop, **kwargs)
+        except Exception:
+            results.put(('error', request_id, traceback.format_exc()))
+        else:
+            results.put(('done', request_id, result))
+
+
+def _context():
+    # Fork where available: spawning would re-import the front end's main
+    # module in the worker, and pygame front ends open their window at import
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+class SearchWorker:
+    """
+    Runs one engine search at a time in a background process
+
+    engines maps names to engine objects (they must pickle where processes
+    are spawned). submit(name, method, ...) calls engines[name].method(...)
+    in the worker with a ``stop`` keyword: an object with is_set() that
+    turns true when the search is cancelled, and which the engines check
+    between iterations/nodes. Results of cancelled searches are discarded.
+    """
+
+    def __init__(self, engines: Dict[str, Any]):
+        context = _context()
+        self._requests = context.Queue()
+        self._results = context.Queue()
+        self._wanted = context.RawValue('q', CANCELLED)
+        self._process = context.Process(target=_serve, name='ai-search',
+                                        args=(engines, self._requests, self._results, self._wanted))
+        self._process.start()
+        self._ids = itertools.count(1)
+        self._request: Optional[int] = None
+        self.progress = None  # latest progress report of the running search
+        atexit.register(self.shutdown)
+
+    @property
+    def busy(self) -> bool:
+        """True from submit() until the result has been collected by poll() or cancelled"""
+        return self._request is not None
+
+    def submit(self, name: str, method: str, *args, progress: bool = False, **kwargs):
+        """
+        Start engines[name].method(*args, stop=..., **kwargs), cancelling any search still running
+
+        With progress, the engine also gets a progress callback whose
+        reports show up in the progress attribute as poll() collects them.
+        """
+        self.cancel()
+        self._request = next(self._ids)
+        self._wanted.value = self._request
+        self.progress = None
+        self._requests.put((self._request, name, method, args, kwargs, progress))
+
+    def poll(self) -> Tuple[bool, Any]:
+        """Return (True, result) once the search has finished, else (False, None)"""
+        while self._request is not None:
+            try:
+                kind, request_id, payload = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if request_id != self._request:
+                continue  # left over from a cancelled search
+            if kind == 'progress':
+                self.progress = payload
+                continue
+            self._request = None
+            if kind == 'error':
+                raise RuntimeError('search failed in the worker process:\n' + payload)
+            return True, payload
+        return False, None
+
+    def cancel(self):
+        """Ask the running search to stop and forget its result"""
+        if self._request is not None:
+            self._wanted.value = CANCELLED
+            self._request = None
+
+    def shutdown(self):
+        self.cancel()
+        if self._process.is_alive():
+            self._requests.put(None)
+            self._process.join(1.0)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join()
+        # Unread reports must not hold up interpreter exit
+        self._requests.cancel_join_thread()
+        self._results.cancel_join_thread()
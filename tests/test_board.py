@@ -0,0 +1,134 @@
+import random
+
+import pytest
+
+from engine import NEIGHBOURS, NODE_INDEX, NODE_NAMES, NUM_NODES, Position, batch, bits, mask_of, zobrist_key
+from engine.board import mobility
+from engine.mcts import GREEDY_CANDIDATES, MCTS
+from engine.tablebase import _play
+
+
+def random_positions(count, seed=0, max_plies=40):
+    """Positions reached by random play from the start, with the side to move"""
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(count):
+        position = Position()
+        ai_to_move = True
+        for _ in range(rng.randrange(max_plies)):
+            moves = position.get_moves(ai_to_move)
+            if not moves or position.is_terminal():
+                break
+            position.apply_move(rng.choice(moves), ai_to_move)
+            ai_to_move = not ai_to_move
+        if not position.is_terminal() and position.get_moves(ai_to_move):
+            positions.append((position, ai_to_move))
+    return positions
+
+
+def game_loop_move(ai, human, move, ai_to_move):
+    """
+    The capture rule as the original game loop applied it, on node lists
+
+    Every bead is checked in turn, AI side first; a bead with no empty
+    neighbour and at least one enemy neighbour is removed, and its node is
+    free when the next bead is checked.
+    """
+    ai, human = sorted(ai), sorted(human)
+    src, dst = move
+    own = ai if ai_to_move else human
+    own[own.index(src)] = dst
+    own.sort()
+    for beads, enemy in ((ai, human), (human, ai)):
+        for bead in beads[:]:
+            empty = sum(1 for n in NEIGHBOURS[bead] if n not in ai and n not in human)
+            enemies = sum(1 for n in NEIGHBOURS[bead] if n in enemy)
+            if empty == 0 and enemies > 0:
+                beads.remove(bead)
+    return mask_of(ai), mask_of(human)
+
+
+def test_make_unmake_restores_state_and_key():
+    rng = random.Random(1)
+    for position, ai_to_move in random_positions(50, seed=1):
+        start = (position.ai, position.human, position.key, position.ai_mobility, position.human_mobility)
+        states = []
+        for _ in range(12):
+            moves = position.get_moves(ai_to_move)
+            if not moves or position.is_terminal():
+                break
+            states.append((position.ai, position.human, position.key, position.ai_mobility, position.human_mobility))
+            position.make_move(rng.choice(moves), ai_to_move)
+            # Incremental key and mobility match a position built from scratch
+            assert position.key == zobrist_key(position.ai, position.human)
+            assert position.ai_mobility == mobility(position.ai, position.empty)
+            assert position.human_mobility == mobility(position.human, position.empty)
+            ai_to_move = not ai_to_move
+        while states:
+            position.unmake_move()
+            assert (position.ai, position.human, position.key, position.ai_mobility,
+                    position.human_mobility) == states.pop()
+        assert (position.ai, position.human, position.key, position.ai_mobility,
+                position.human_mobility) == start
+
+
+def test_hash_includes_side_to_move():
+    position = Position()
+    assert position.hash_for(True) != position.hash_for(False)
+
+
+def test_neighbouring_trapped_beads_are_captured_one_at_a_time():
+    # Closing top_t boxes in both top and top_l; taking top frees a node next to top_l
+    ai = [NODE_INDEX[n] for n in ('top', 'top_l', 'left', 'left_l', 'bottom')]
+    human = [NODE_INDEX[n] for n in ('top_r', 'right_r', 'center_t_up', 'center', 'right')]
+    move = (NODE_INDEX['center_t_up'], NODE_INDEX['top_t'])
+    position = Position(mask_of(ai), mask_of(human))
+    position.apply_move(move, False)
+    assert (position.ai, position.human) == game_loop_move(ai, human, move, False)
+    assert sorted(NODE_NAMES[b] for b in bits(position.ai)) == ['bottom', 'left', 'left_l', 'top_l']
+
+
+def test_apply_move_matches_game_loop_captures():
+    checked = 0
+    for position, ai_to_move in random_positions(300, seed=2):
+        for move in position.get_moves(ai_to_move):
+            child = position.clone()
+            child.apply_move(move, ai_to_move)
+            expected = game_loop_move(list(bits(position.ai)), list(bits(position.human)), move, ai_to_move)
+            assert (child.ai, child.human) == expected
+            assert _play(position.ai, position.human, move[0], move[1], ai_to_move) == expected
+            checked += 1
+    assert checked > 1000
+
+
+@pytest.mark.skipif(not batch.available, reason='NumPy is not installed')
+def test_batch_children_match_apply_move():
+    for position, ai_to_move in random_positions(200, seed=3):
+        moves, ai, human = batch.children(position, ai_to_move)
+        for move, child_ai, child_human in zip(moves, ai.tolist(), human.tolist()):
+            child = position.clone()
+            child.apply_move(move, ai_to_move)
+            assert (child_ai, child_human) == (child.ai, child.human)
+
+
+@pytest.mark.skipif(not batch.available, reason='NumPy is not installed')
+def test_batch_greedy_moves_match_mcts_playouts():
+    np = batch.np
+    positions = random_positions(200, seed=5)
+    ai = np.array([p.ai for p, _ in positions], dtype=np.uint32)
+    human = np.array([p.human for p, _ in positions], dtype=np.uint32)
+    turn = np.array([side for _, side in positions])
+    own = np.where(turn, ai, human)
+    empty = batch._FULL ^ (ai | human)
+    legal = ((own[:, None] & batch._EDGE_SRC) != 0) & ((empty[:, None] & batch._EDGE_DST) != 0)
+    edges = batch._greedy_edges(ai, human, turn, legal, legal.sum(axis=1), GREEDY_CANDIDATES)
+    mcts = MCTS()
+    for i, (position, ai_to_move) in enumerate(positions):
+        moves = position.get_moves(ai_to_move)
+        # Legal edges come in get_moves() order, so the candidates are the same
+        assert [batch._EDGES[e] for e in np.flatnonzero(legal[i])] == moves
+        assert batch._EDGES[edges[i]] == mcts._greedy_move(position, moves, ai_to_move)
+
+
+def test_masks_cover_every_node():
+    assert mask_of(range(NUM_NODES)) == (1 << NUM_NODES) - 1
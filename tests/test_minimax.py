@@ -0,0 +1,44 @@
+import math
+
+import pytest
+
+from engine import AlphaBeta, Position
+from test_board import random_positions
+
+
+def plain_minimax(position, depth, max_player):
+    """Minimax without pruning or a table, scored like AlphaBeta's leaves"""
+    if depth == 0 or position.is_terminal():
+        return position.minimax_score()
+    best = -math.inf if max_player else math.inf
+    for move in position.get_moves(max_player):
+        child = position.clone()
+        child.apply_move(move, max_player)
+        score = plain_minimax(child, depth - 1, not max_player)
+        best = max(best, score) if max_player else min(best, score)
+    return best
+
+
+# Up to depth 3 a position cannot come back at a different remaining depth,
+# so every table cut-off must agree with the full tree
+@pytest.mark.parametrize('depth', [1, 2, 3])
+def test_alpha_beta_with_table_matches_plain_minimax(depth):
+    for position, ai_to_move in random_positions(25, seed=depth):
+        score, move = AlphaBeta(table_mb=1).search(position, depth, ai_to_move)
+        assert score == plain_minimax(position, depth, ai_to_move)
+        # The returned move reaches that score
+        child = position.clone()
+        child.apply_move(move, ai_to_move)
+        assert plain_minimax(child, depth - 1, not ai_to_move) == score
+
+
+def test_iterative_deepening_matches_fixed_depth():
+    for position, ai_to_move in random_positions(15, seed=4):
+        score, _ = AlphaBeta(table_mb=1).iterative(position, ai_to_move, max_depth=3)
+        assert score == plain_minimax(position, 3, ai_to_move)
+
+
+def test_start_position_search_returns_legal_move():
+    position = Position()
+    _, move = AlphaBeta(table_mb=1).search(position, 4, True)
+    assert move in position.get_moves(True)
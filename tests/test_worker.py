@@ -0,0 +1,36 @@
+import time
+
+from engine import AlphaBeta, Position
+from engine.worker import SearchWorker
+
+
+def wait_for(worker, timeout=10.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        done, result = worker.poll()
+        if done:
+            return result
+        time.sleep(0.01)
+    raise AssertionError('no result from the worker')
+
+
+def test_search_runs_in_worker_and_cancels():
+    worker = SearchWorker({'minimax': AlphaBeta(table_mb=1)})
+    try:
+        worker.submit('minimax', 'iterative', Position(), True, time_limit=0.2, progress=True)
+        score, move = wait_for(worker)
+        assert move in Position().get_moves(True)
+        assert worker.progress is not None and worker.progress['depth'] >= 1
+
+        # A cancelled search stops early and its result never shows up
+        worker.submit('minimax', 'iterative', Position(), True, time_limit=30.0)
+        time.sleep(0.1)
+        worker.cancel()
+        assert not worker.busy
+        start = time.perf_counter()
+        worker.submit('minimax', 'iterative', Position(), False, max_depth=1)
+        _, move = wait_for(worker)
+        assert move in Position().get_moves(False)
+        assert time.perf_counter() - start < 5.0
+    finally:
+        worker.shutdown()